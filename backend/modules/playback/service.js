@@ -88,10 +88,10 @@ async function setCurrentItem(roomId, item, positionMs = 0) {
   return setState(roomId, { currentItem: item, positionMs, isPlaying: true });
 }
 
-async function addToQueue(roomId, item) {
+async function addToQueue(roomId, ...items) {
   const state = await getState(roomId);
   if (!state) return null;
-  const queue = [...(state.queue || []), item];
+  const queue = [...(state.queue || []), ...items];
   return setState(roomId, { queue });
 }
 
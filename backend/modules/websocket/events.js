@@ -26,6 +26,7 @@ const C2S = {
   AUTOPLAY_REMOVE: 'autoplay_remove',
   AUTOPLAY_REORDER: 'autoplay_reorder',
   AUTOPLAY_PROMOTE: 'autoplay_promote',
+  QUEUE_SYNC: 'queue_sync',  // queue_diff clients: request a full queue_updated
 
   // Voting
   VOTE: 'vote',
@@ -57,6 +58,7 @@ const S2C = {
 
   // Queue
   QUEUE_UPDATED: 'queue_updated',
+  QUEUE_DIFF: 'queue_diff',
   AUTOPLAY_SUGGESTIONS: 'autoplay_suggestions',
 
   // Voting
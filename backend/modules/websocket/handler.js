@@ -4,6 +4,7 @@ const playbackService = require('../playback/service');
 const autoplayService = require('../playback/autoplay');
 const votingService = require('../voting/service');
 const { C2S, S2C } = require('./events');
+const msgpack = require('./msgpack');
 
 /**
  * In-memory map of active WebSocket connections per room.
@@ -12,6 +13,8 @@ const { C2S, S2C } = require('./events');
 const roomConnections = new Map();
 // Per-room autoplay feedback state: { trackId, likes:Set<userId>, dislikes:Set<userId> }
 const feedbackState = new Map();
+// Per-room queue as last broadcast: { version, queue, autoplayQueue } (see broadcastQueue)
+const queueVersions = new Map();
 
 function getRoomClients(roomId) {
   return roomConnections.get(roomId) || new Map();
@@ -50,22 +53,186 @@ function removeRoomConnection(roomId, userId, ws) {
   };
 }
 
+/**
+ * Wire encoding. A client that authenticates with `encoding: 'msgpack'` gets
+ * binary MessagePack frames, and with `compress: true` gets permessage-deflate
+ * on large frames (when its WS handshake offered the extension). Everyone else
+ * gets uncompressed JSON text. A Frame is encoded at most once per format,
+ * however many sockets it fans out to.
+ */
+const COMPRESS_THRESHOLD = 1024;
+
+class Frame {
+  constructor(event, data) {
+    this.message = { event, data, ts: Date.now() };
+    this._json = null;
+    this._packed = null;
+  }
+
+  encode(binary) {
+    if (binary) return this._packed || (this._packed = msgpack.encode(this.message));
+    return this._json || (this._json = JSON.stringify(this.message));
+  }
+}
+
+function deliver(ws, frame) {
+  const physical = ws._physical || ws;
+  const binary = physical._binary;
+  let payload = frame.encode(binary);
+  if (ws._physical) {
+    payload = binary
+      ? msgpack.withEntry(payload, ws._roomEntry)
+      : `{"room":${JSON.stringify(ws._room)},${payload.slice(1)}`;
+  }
+  physical.send(payload, {
+    binary,
+    compress: physical._compress && payload.length >= COMPRESS_THRESHOLD,
+  });
+}
+
 function broadcast(roomId, event, data, excludeUserId = null) {
   const clients = getRoomClients(roomId);
-  const message = JSON.stringify({ event, data, ts: Date.now() });
+  const frame = new Frame(event, data);
   for (const [uid, sockets] of clients) {
     if (uid === excludeUserId) continue;
     for (const ws of sockets) {
       if (ws.readyState === 1) { // OPEN
-        ws.send(message);
+        deliver(ws, frame);
       }
     }
   }
 }
 
+/**
+ * Versioned queue updates. Every change to a room's queues bumps its version.
+ * Sockets that joined with `features: ['queue_diff']` get `queue_diff` (ops
+ * against the previous version) instead of full `queue_updated` lists, and
+ * playback events without the queues. A client that sees a version gap sends
+ * `queue_sync` and gets a full `queue_updated`.
+ */
+function diffQueue(prev, next) {
+  const a = prev.map((t) => t.videoId);
+  const b = next.map((t) => t.videoId);
+  let start = 0;
+  while (start < a.length && start < b.length && a[start] === b[start]) start++;
+  let endA = a.length;
+  let endB = b.length;
+  while (endA > start && endB > start && a[endA - 1] === b[endB - 1]) { endA--; endB--; }
+  if (endA === start && endB === start) return [];
+
+  // A single reorder shows up as one item rotated across the changed window
+  if (endA - start === endB - start && endA - start > 1) {
+    const same = (from, to, len) => a.slice(from, from + len).every((id, i) => id === b[to + i]);
+    const len = endA - start - 1;
+    if (a[start] === b[endB - 1] && same(start + 1, start, len)) {
+      return [{ op: 'move', from: start, to: endB - 1 }];
+    }
+    if (a[endA - 1] === b[start] && same(start, start + 1, len)) {
+      return [{ op: 'move', from: endA - 1, to: start }];
+    }
+  }
+  return [{ op: 'splice', index: start, remove: endA - start, items: next.slice(start, endB) }];
+}
+
+function advanceQueueVersion(roomId, state) {
+  const prev = queueVersions.get(roomId) || { version: 0, queue: [], autoplayQueue: [] };
+  const queue = state?.queue || [];
+  const autoplayQueue = state?.autoplayQueue || [];
+  const update = {
+    baseVersion: prev.version,
+    version: prev.version,
+    queue: diffQueue(prev.queue, queue),
+    autoplayQueue: diffQueue(prev.autoplayQueue, autoplayQueue),
+  };
+  if (update.queue.length || update.autoplayQueue.length || !queueVersions.has(roomId)) {
+    update.version = prev.version + 1;
+  }
+  queueVersions.set(roomId, { version: update.version, queue, autoplayQueue });
+  return update;
+}
+
+function forEachRoomSocket(roomId, fn) {
+  for (const [, sockets] of getRoomClients(roomId)) {
+    for (const ws of sockets) {
+      if (ws.readyState === 1) fn(ws);
+    }
+  }
+}
+
+function sendQueueDiff(roomId, update, excludeWs = null) {
+  if (update.version === update.baseVersion) return;
+  const frame = new Frame(S2C.QUEUE_DIFF, update);
+  forEachRoomSocket(roomId, (ws) => {
+    if (ws._queueDiff && ws !== excludeWs) deliver(ws, frame);
+  });
+}
+
+function broadcastQueue(roomId, state) {
+  const update = advanceQueueVersion(roomId, state);
+  sendQueueDiff(roomId, update);
+  const frame = new Frame(S2C.QUEUE_UPDATED, {
+    queue: state.queue,
+    autoplayQueue: state.autoplayQueue,
+    version: update.version,
+  });
+  forEachRoomSocket(roomId, (ws) => {
+    if (!ws._queueDiff) deliver(ws, frame);
+  });
+}
+
+function broadcastPlayback(roomId, event, state) {
+  // Queue changes riding on a playback event reach queue_diff clients first
+  sendQueueDiff(roomId, advanceQueueVersion(roomId, state));
+  const playback = serializePlayback(state);
+  const full = new Frame(event, playback);
+  let compact = null;
+  forEachRoomSocket(roomId, (ws) => {
+    if (!ws._queueDiff) return deliver(ws, full);
+    if (!compact) {
+      compact = new Frame(event, { ...playback, queue: undefined, autoplayQueue: undefined });
+    }
+    deliver(ws, compact);
+  });
+}
+
+function sendQueueSnapshot(ws) {
+  const entry = queueVersions.get(ws._roomId);
+  if (!entry) return;
+  sendTo(ws, S2C.QUEUE_UPDATED, {
+    queue: entry.queue,
+    autoplayQueue: entry.autoplayQueue,
+    version: entry.version,
+  });
+}
+
+/**
+ * Room multiplexing: a client may carry several rooms over one socket by
+ * tagging each message with `room` (the join code it used). Every tagged room
+ * gets a virtual socket that the regular handlers treat like a real one;
+ * messages sent to it are tagged with the same `room` value. A virtual socket
+ * is kept only once its `join_room` succeeds, and one connection holds at most
+ * MAX_VIRTUAL_ROOMS of them.
+ */
+const FEATURES = ['room_mux', 'queue_diff', 'msgpack', 'compress', 'queue_batch'];
+const MAX_VIRTUAL_ROOMS = 32;
+
+function makeVirtualSocket(ws, room) {
+  return {
+    _physical: ws,
+    _room: room,
+    _roomEntry: Buffer.concat([msgpack.encode('room'), msgpack.encode(room)]),
+    _userId: ws._userId,
+    _username: ws._username,
+    _roomId: null,
+    _isHost: false,
+    get readyState() { return ws.readyState; },
+    close(code, reason) { ws.close(code, reason); },
+  };
+}
+
 function sendTo(ws, event, data) {
   if (ws.readyState === 1) {
-    ws.send(JSON.stringify({ event, data, ts: Date.now() }));
+    deliver(ws, new Frame(event, data));
   }
 }
 
@@ -139,14 +306,26 @@ function setupWebSocket(wss) {
     ws._roomId = null;
     ws._isHost = false;
     ws._isAlive = true;
+    ws._virtuals = new Map(); // room code -> virtual socket (see makeVirtualSocket)
+    ws._binary = false;
+    ws._compress = false;
 
-    const tryAuth = (candidate) => {
+    const tryAuth = (candidate, options = {}) => {
       const user = verifyWsToken(candidate);
       if (!user) return false;
       ws._userId = user.sub;
       ws._username = user.username;
       ws._isHost = false;
-      sendTo(ws, S2C.CONNECTED, { userId: user.sub, username: user.username });
+      // Applies from `connected` on; it reports what the client actually gets
+      ws._binary = options.encoding === 'msgpack';
+      ws._compress = options.compress === true && /permessage-deflate/.test(ws.extensions);
+      sendTo(ws, S2C.CONNECTED, {
+        userId: user.sub,
+        username: user.username,
+        features: FEATURES,
+        encoding: ws._binary ? 'msgpack' : 'json',
+        compress: ws._compress,
+      });
       return true;
     };
 
@@ -166,10 +345,32 @@ function setupWebSocket(wss) {
       } catch {
         return sendTo(ws, S2C.ERROR, { code: 'INVALID_MSG', message: 'Invalid JSON' });
       }
+      if (msg && typeof msg.room === 'string' && ws._userId) {
+        let vws = ws._virtuals.get(msg.room);
+        if (!vws) {
+          vws = makeVirtualSocket(ws, msg.room);
+          if (msg.event !== C2S.JOIN_ROOM) {
+            return sendTo(vws, S2C.ERROR, { code: 'NOT_IN_ROOM', message: 'Join this room first' });
+          }
+          if (ws._virtuals.size >= MAX_VIRTUAL_ROOMS) {
+            return sendTo(vws, S2C.ERROR, { code: 'TOO_MANY_ROOMS', message: `At most ${MAX_VIRTUAL_ROOMS} rooms per connection` });
+          }
+          ws._virtuals.set(msg.room, vws);
+        }
+        await handleMessage(vws, msg, tryAuth);
+        if ((msg.event === C2S.LEAVE_ROOM || !vws._roomId) && ws._virtuals.get(msg.room) === vws) {
+          ws._virtuals.delete(msg.room);
+        }
+        return;
+      }
       await handleMessage(ws, msg, tryAuth);
     });
 
-    ws.on('close', () => handleDisconnect(ws));
+    ws.on('close', async () => {
+      for (const vws of ws._virtuals.values()) await handleDisconnect(vws);
+      ws._virtuals.clear();
+      await handleDisconnect(ws);
+    });
     ws.on('error', (err) => console.error('[WS] Error for user', ws._userId, err.message));
   });
 
@@ -195,7 +396,7 @@ async function handleMessage(ws, msg, tryAuth) {
   if (event === C2S.AUTH) {
     if (ws._userId) return sendTo(ws, S2C.ERROR, { code: 'ALREADY_AUTH', message: 'Already authenticated' });
     if (!data?.token) return sendTo(ws, S2C.ERROR, { code: 'MISSING_TOKEN', message: 'Token required' });
-    const ok = tryAuth(data.token);
+    const ok = tryAuth(data.token, data);
     if (!ok) {
       sendTo(ws, S2C.ERROR, { code: 'AUTH_FAILED', message: 'Invalid or expired token' });
       return ws.close(4001, 'Unauthorized');
@@ -273,6 +474,10 @@ async function handleMessage(ws, msg, tryAuth) {
         await handleAutoplayPromote(ws, data);
         break;
 
+      case C2S.QUEUE_SYNC:
+        sendQueueSnapshot(ws);
+        break;
+
       case C2S.VOTE:
         await handleVote(ws, data);
         break;
@@ -294,7 +499,7 @@ async function handleMessage(ws, msg, tryAuth) {
   }
 }
 
-async function handleJoinRoom(ws, { code }) {
+async function handleJoinRoom(ws, { code, features }) {
   if (!code) return sendTo(ws, S2C.ERROR, { code: 'MISSING_CODE', message: 'Room code required' });
 
   const room = await roomService.getRoomByCode(code);
@@ -314,17 +519,23 @@ async function handleJoinRoom(ws, { code }) {
 
   ws._roomId = room.id;
   ws._isHost = room.host_id === userId;
+  ws._queueDiff = Array.isArray(features) && features.includes('queue_diff');
 
   // Get full state for new member
   let playbackState = await playbackService.ensureAutoplayQueue(room.id, room.settings);
   if (!playbackState) playbackState = await playbackService.getState(room.id);
   const members = await roomService.getMembers(room.id);
 
+  // The joiner's baseline is this state; others get whatever changed since
+  const queueUpdate = advanceQueueVersion(room.id, playbackState);
+  sendQueueDiff(room.id, queueUpdate, ws);
+
   sendTo(ws, S2C.ROOM_STATE, {
     room: sanitizeRoom(room),
     playback: serializePlayback(playbackState),
     members,
     isHost: ws._isHost,
+    queueVersion: queueUpdate.version,
   });
   ensureFeedbackTrack(room.id, playbackState?.currentItem?.videoId || null);
   emitFeedback(room.id, ws);
@@ -373,6 +584,7 @@ async function doLeave(ws, isDrop) {
     });
     roomConnections.delete(roomId);
     feedbackState.delete(roomId);
+    queueVersions.delete(roomId);
   } else if (!userStillPresent) {
     const fb = feedbackState.get(roomId);
     if (fb) {
@@ -396,7 +608,7 @@ async function handlePlay(ws) {
     });
   }
   const state = await playbackService.play(ws._roomId);
-  broadcast(ws._roomId, S2C.PLAYBACK_STATE, serializePlayback(state));
+  broadcastPlayback(ws._roomId, S2C.PLAYBACK_STATE, state);
 }
 
 async function handlePause(ws, { positionMs }) {
@@ -407,13 +619,13 @@ async function handlePause(ws, { positionMs }) {
     });
   }
   const state = await playbackService.pause(ws._roomId, positionMs || 0);
-  broadcast(ws._roomId, S2C.PLAYBACK_STATE, serializePlayback(state));
+  broadcastPlayback(ws._roomId, S2C.PLAYBACK_STATE, state);
 }
 
 async function handleSeek(ws, { positionMs }) {
   if (!ws._isHost) return sendTo(ws, S2C.ERROR, { code: 'FORBIDDEN', message: 'Only host can seek' });
   const state = await playbackService.seek(ws._roomId, positionMs || 0);
-  broadcast(ws._roomId, S2C.PLAYBACK_SEEK, serializePlayback(state));
+  broadcastPlayback(ws._roomId, S2C.PLAYBACK_SEEK, state);
 }
 
 async function handleSkip(ws, data) {
@@ -421,6 +633,12 @@ async function handleSkip(ws, data) {
   if (!room) return;
 
   if (ws._isHost || room.settings.userSkipMode === 'instant') {
+    // A skip for a track that already changed (e.g. sent by several bot
+    // guilds in one room at the same track end) does nothing.
+    if (data?.trackId) {
+      const current = await playbackService.getState(ws._roomId);
+      if (current?.currentItem?.videoId !== data.trackId) return;
+    }
     await doSkip(ws._roomId, room.settings);
   } else {
     await handleVote(ws, { action: 'skip', trackId: room.settings.currentTrackId || data.trackId });
@@ -434,7 +652,7 @@ async function handlePrev(ws, data) {
   if (ws._isHost || room.settings.userPrevMode === 'instant') {
     // "prev" in queue context: restart current track
     const state = await playbackService.seek(ws._roomId, 0);
-    broadcast(ws._roomId, S2C.PLAYBACK_SEEK, serializePlayback(state));
+    broadcastPlayback(ws._roomId, S2C.PLAYBACK_SEEK, state);
   } else {
     await handleVote(ws, { action: 'prev', trackId: data.trackId });
   }
@@ -484,8 +702,8 @@ async function doSkip(roomId, settings = {}) {
   ensureFeedbackTrack(roomId, state?.currentItem?.videoId || null);
   emitFeedback(roomId);
 
-  broadcast(roomId, S2C.NOW_PLAYING, serializePlayback(state));
-  broadcast(roomId, S2C.QUEUE_UPDATED, { queue: state.queue, autoplayQueue: state.autoplayQueue });
+  broadcastPlayback(roomId, S2C.NOW_PLAYING, state);
+  broadcastQueue(roomId, state);
   await emitAutoplaySuggestions(roomId, settings);
 }
 
@@ -521,7 +739,7 @@ async function handleVote(ws, { action, trackId }) {
         await doSkip(roomId, settings);
       } else if (action === 'prev') {
         const state = await playbackService.seek(roomId, 0);
-        broadcast(roomId, S2C.PLAYBACK_SEEK, serializePlayback(state));
+        broadcastPlayback(roomId, S2C.PLAYBACK_SEEK, state);
         votingService.resetVotes(roomId);
       }
     }
@@ -585,7 +803,10 @@ async function handleFeedback(ws, { trackId, value }) {
   }
 }
 
-async function handleQueueAdd(ws, { item }) {
+// Upper bound on `items` in one batched queue_add.
+const QUEUE_BATCH_MAX = 200;
+
+async function handleQueueAdd(ws, { item, items }) {
   const roomId = ws._roomId;
   const room = await roomService.getRoomById(roomId);
   if (!room) return;
@@ -594,32 +815,40 @@ async function handleQueueAdd(ws, { item }) {
     return sendTo(ws, S2C.ERROR, { code: 'FORBIDDEN', message: 'Queueing is disabled for this room' });
   }
 
-  if (!item || !item.videoId) {
+  // `items` (queue_batch) adds many tracks with one state write and one
+  // queue broadcast; `item` is the single-track form.
+  const batch = Array.isArray(items) ? items : [item];
+  if (!batch.length || batch.length > QUEUE_BATCH_MAX || batch.some((it) => !it || !it.videoId)) {
     return sendTo(ws, S2C.ERROR, { code: 'INVALID', message: 'Invalid track item' });
   }
 
-  const enriched = {
-    ...item,
-    addedBy: { id: ws._userId, username: ws._username || null },
-  };
+  const addedBy = { id: ws._userId, username: ws._username || null };
+  const enriched = batch.map((it) => ({ ...it, addedBy }));
 
-  await playbackService.learnTaste(roomId, enriched, { weight: 1.2 });
+  for (const track of enriched) {
+    await playbackService.learnTaste(roomId, track, { weight: 1.2 });
+  }
 
   const state = await playbackService.getState(roomId);
 
-  // If nothing is playing, start playing immediately
+  // If nothing is playing, start playing the first track immediately
   if (!state.currentItem) {
-    const newState = await playbackService.setCurrentItem(roomId, enriched, 0);
+    const [first, ...rest] = enriched;
+    let newState = await playbackService.setCurrentItem(roomId, first, 0);
     await playbackService.markAutoplaySeeded(roomId);
-    ensureFeedbackTrack(roomId, enriched.videoId);
+    ensureFeedbackTrack(roomId, first.videoId);
     emitFeedback(roomId);
-    broadcast(roomId, S2C.NOW_PLAYING, serializePlayback(newState));
+    broadcastPlayback(roomId, S2C.NOW_PLAYING, newState);
+    if (rest.length) {
+      newState = await playbackService.addToQueue(roomId, ...rest);
+      broadcastQueue(roomId, newState);
+    }
     if (room.settings?.autoplayEnabled) {
       await playbackService.ensureAutoplayQueue(roomId, room.settings);
     }
   } else {
-    const newState = await playbackService.addToQueue(roomId, enriched);
-    broadcast(roomId, S2C.QUEUE_UPDATED, { queue: newState.queue, autoplayQueue: newState.autoplayQueue });
+    const newState = await playbackService.addToQueue(roomId, ...enriched);
+    broadcastQueue(roomId, newState);
     if (room.settings?.autoplayEnabled) {
       await playbackService.ensureAutoplayQueue(roomId, room.settings);
     }
@@ -639,7 +868,7 @@ async function handleQueueRemove(ws, { index }) {
 
   const newState = await playbackService.removeFromQueue(roomId, index);
   if (newState) {
-    broadcast(roomId, S2C.QUEUE_UPDATED, { queue: newState.queue, autoplayQueue: newState.autoplayQueue });
+    broadcastQueue(roomId, newState);
     await emitAutoplaySuggestions(roomId, room.settings);
   }
 }
@@ -655,7 +884,7 @@ async function handleQueueReorder(ws, { fromIndex, toIndex }) {
 
   const newState = await playbackService.reorderQueue(roomId, fromIndex, toIndex);
   if (newState) {
-    broadcast(roomId, S2C.QUEUE_UPDATED, { queue: newState.queue, autoplayQueue: newState.autoplayQueue });
+    broadcastQueue(roomId, newState);
     await emitAutoplaySuggestions(roomId, room.settings);
   }
 }
@@ -681,8 +910,8 @@ async function handleQueuePlayNow(ws, { index }) {
   votingService.resetVotes(roomId);
   ensureFeedbackTrack(roomId, item.videoId);
   emitFeedback(roomId);
-  broadcast(roomId, S2C.NOW_PLAYING, serializePlayback(newState));
-  broadcast(roomId, S2C.QUEUE_UPDATED, { queue: newState.queue, autoplayQueue: newState.autoplayQueue });
+  broadcastPlayback(roomId, S2C.NOW_PLAYING, newState);
+  broadcastQueue(roomId, newState);
   await emitAutoplaySuggestions(roomId, room.settings);
 }
 
@@ -699,7 +928,7 @@ async function handleAutoplayRemove(ws, { index }) {
     newState = await playbackService.ensureAutoplayQueue(roomId, room.settings) || newState;
   }
   if (newState) {
-    broadcast(roomId, S2C.QUEUE_UPDATED, { queue: newState.queue, autoplayQueue: newState.autoplayQueue });
+    broadcastQueue(roomId, newState);
   }
 }
 
@@ -713,7 +942,7 @@ async function handleAutoplayReorder(ws, { fromIndex, toIndex }) {
 
   const newState = await playbackService.reorderAutoplayQueue(roomId, fromIndex, toIndex);
   if (newState) {
-    broadcast(roomId, S2C.QUEUE_UPDATED, { queue: newState.queue, autoplayQueue: newState.autoplayQueue });
+    broadcastQueue(roomId, newState);
   }
 }
 
@@ -730,7 +959,7 @@ async function handleAutoplayPromote(ws, { index, toIndex }) {
     newState = await playbackService.ensureAutoplayQueue(roomId, room.settings) || newState;
   }
   if (newState) {
-    broadcast(roomId, S2C.QUEUE_UPDATED, { queue: newState.queue, autoplayQueue: newState.autoplayQueue });
+    broadcastQueue(roomId, newState);
   }
 }
 
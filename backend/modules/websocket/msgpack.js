@@ -0,0 +1,131 @@
+/**
+ * Minimal MessagePack encoder for outgoing WS frames.
+ *
+ * Encodes the same values JSON.stringify would produce: objects with toJSON
+ * (Dates) are converted first, undefined/function object entries are
+ * skipped, and undefined array items and non-finite numbers become nil. The
+ * server never needs to decode MessagePack; clients keep sending JSON text.
+ */
+
+class Writer {
+  constructor() {
+    this.buf = Buffer.allocUnsafe(1024);
+    this.pos = 0;
+  }
+
+  ensure(n) {
+    if (this.pos + n <= this.buf.length) return;
+    const next = Buffer.allocUnsafe(Math.max(this.buf.length * 2, this.pos + n));
+    this.buf.copy(next, 0, 0, this.pos);
+    this.buf = next;
+  }
+
+  u8(v) { this.ensure(1); this.buf[this.pos++] = v; }
+  u8u8(a, b) { this.ensure(2); this.buf[this.pos++] = a; this.buf[this.pos++] = b; }
+  u8u16(a, v) { this.ensure(3); this.buf[this.pos++] = a; this.buf.writeUInt16BE(v, this.pos); this.pos += 2; }
+  u8u32(a, v) { this.ensure(5); this.buf[this.pos++] = a; this.buf.writeUInt32BE(v, this.pos); this.pos += 4; }
+
+  str(s) {
+    const len = Buffer.byteLength(s);
+    if (len < 32) this.u8(0xa0 | len);
+    else if (len < 0x100) this.u8u8(0xd9, len);
+    else if (len < 0x10000) this.u8u16(0xda, len);
+    else this.u8u32(0xdb, len);
+    this.ensure(len);
+    this.pos += this.buf.write(s, this.pos);
+  }
+
+  num(n) {
+    if (!Number.isFinite(n)) return this.u8(0xc0);
+    if (Number.isInteger(n)) {
+      if (n >= 0) {
+        if (n < 0x80) return this.u8(n);
+        if (n < 0x100) return this.u8u8(0xcc, n);
+        if (n < 0x10000) return this.u8u16(0xcd, n);
+        if (n < 0x100000000) return this.u8u32(0xce, n);
+        if (n <= Number.MAX_SAFE_INTEGER) {
+          this.ensure(9);
+          this.buf[this.pos++] = 0xcf;
+          this.buf.writeBigUInt64BE(BigInt(n), this.pos);
+          this.pos += 8;
+          return;
+        }
+      } else {
+        if (n >= -32) return this.u8(n & 0xff);
+        if (n >= -0x80) return this.u8u8(0xd0, n & 0xff);
+        if (n >= -0x8000) { this.ensure(3); this.buf[this.pos++] = 0xd1; this.buf.writeInt16BE(n, this.pos); this.pos += 2; return; }
+        if (n >= -0x80000000) { this.ensure(5); this.buf[this.pos++] = 0xd2; this.buf.writeInt32BE(n, this.pos); this.pos += 4; return; }
+        if (n >= Number.MIN_SAFE_INTEGER) {
+          this.ensure(9);
+          this.buf[this.pos++] = 0xd3;
+          this.buf.writeBigInt64BE(BigInt(n), this.pos);
+          this.pos += 8;
+          return;
+        }
+      }
+    }
+    this.ensure(9);
+    this.buf[this.pos++] = 0xcb;
+    this.buf.writeDoubleBE(n, this.pos);
+    this.pos += 8;
+  }
+
+  header(len, fix, fixMax, op16) {
+    if (len < fixMax) this.u8(fix | len);
+    else if (len < 0x10000) this.u8u16(op16, len);
+    else this.u8u32(op16 + 1, len);
+  }
+
+  value(v, inArray) {
+    if (v !== null && typeof v === 'object' && typeof v.toJSON === 'function') v = v.toJSON();
+    switch (typeof v) {
+      case 'string': return this.str(v);
+      case 'number': return this.num(v);
+      case 'boolean': return this.u8(v ? 0xc3 : 0xc2);
+      case 'bigint': throw new TypeError('Do not know how to serialize a BigInt');
+      case 'object':
+        if (v === null) return this.u8(0xc0);
+        if (Array.isArray(v)) {
+          this.header(v.length, 0x90, 16, 0xdc);
+          for (const item of v) this.value(item, true);
+          return;
+        }
+        return this.map(v);
+      default: // undefined, function, symbol
+        if (inArray) this.u8(0xc0);
+    }
+  }
+
+  map(obj) {
+    const keys = [];
+    for (const key of Object.keys(obj)) {
+      const t = typeof obj[key];
+      if (t !== 'undefined' && t !== 'function' && t !== 'symbol') keys.push(key);
+    }
+    this.header(keys.length, 0x80, 16, 0xde);
+    for (const key of keys) {
+      this.str(key);
+      this.value(obj[key], false);
+    }
+  }
+}
+
+function encode(value) {
+  const w = new Writer();
+  w.value(value, true);
+  return w.buf.subarray(0, w.pos);
+}
+
+/**
+ * Adds one entry to an encoded map of fewer than 15 entries without
+ * re-encoding it. `entry` is the encoded key followed by the encoded value.
+ */
+function withEntry(packed, entry) {
+  const out = Buffer.allocUnsafe(packed.length + entry.length);
+  out[0] = packed[0] + 1;
+  entry.copy(out, 1);
+  packed.copy(out, 1 + entry.length, 1);
+  return out;
+}
+
+module.exports = { encode, withEntry };
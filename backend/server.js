@@ -68,7 +68,12 @@ app.use((err, req, res, next) => {
 // ─── WEBSOCKET ────────────────────────────────────────────────────────────────
 // Use explicit upgrade routing to avoid path-handling edge cases with multiple
 // WebSocket servers attached to the same HTTP server.
-const wss = new WebSocketServer({ noServer: true });
+// permessage-deflate is negotiated with any client that offers it, but frames
+// are only compressed for sockets that opted in at auth (see websocket/handler.js)
+const wss = new WebSocketServer({
+  noServer: true,
+  perMessageDeflate: { zlibDeflateOptions: { level: 3 }, threshold: 1024 },
+});
 setupWebSocket(wss);
 
 const workerWss = new WebSocketServer({ noServer: true });
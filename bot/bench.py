@@ -0,0 +1,605 @@
+"""
+Offline benchmark for bot/main.py.
+
+Runs the bot's real event handling, playback and autocomplete code against a
+local stand-in for the backend (auth, search, resolve, WS and the audio
+stream) and a fake VoiceClient, so no Discord or backend is needed:
+
+    python bench.py                          # every scenario, default sizes
+    python bench.py churn --guilds 50        # one scenario
+    python bench.py --json out.json          # save results
+    python bench.py --compare out.json       # exit 1 if a p99 regressed
+
+Scenarios:
+  churn         N guilds in their own rooms (or --guilds-per-room per room);
+                tracks change and queues are reshuffled every round
+                (time-to-audio, event handling, decoders started)
+  seek          bursts of seeks per guild (event handling, decoders started)
+  autocomplete  users typing queries one keystroke at a time (latency,
+                backend searches issued)
+
+The audio stream is a local file served by the fake backend and decoded by
+the same FFmpeg path as production. Without FFmpeg (or with
+--fake-decoder) decoders are replaced by an in-process Opus frame source,
+so time-to-audio then excludes FFmpeg startup.
+"""
+import argparse
+import asyncio
+import base64
+import json
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+
+import msgpack
+from aiohttp import web
+
+FRAME_SEC = 0.02
+WORDS = (
+    "never gonna give you up let it be bohemian rhapsody hotel california smells like teen spirit "
+    "billie jean hey jude imagine like a rolling stone wonderwall one purple rain dancing queen "
+    "stairway to heaven yesterday sweet child of mine born to run london calling take on me"
+).split()
+
+# ── Results ────────────────────────────────────────────────────────────────────
+class Samples:
+    """Named latency samples (seconds) plus counters, shared by all scenarios."""
+    def __init__(self):
+        self.lock    = threading.Lock()
+        self.latency: dict[str, list[float]] = {}
+        self.counts: dict[str, int] = {}
+
+    def add(self, name: str, seconds: float):
+        with self.lock:
+            self.latency.setdefault(name, []).append(seconds)
+
+    def count(self, name: str, amount: int = 1):
+        with self.lock:
+            self.counts[name] = self.counts.get(name, 0) + amount
+
+def _percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+def summarize(samples: Samples, elapsed: float) -> dict:
+    result = {"elapsed_sec": round(elapsed, 3), "counts": dict(samples.counts), "latency_ms": {}}
+    for name, values in sorted(samples.latency.items()):
+        result["latency_ms"][name] = {
+            "n":          len(values),
+            "per_sec":    round(len(values) / elapsed, 1) if elapsed else 0,
+            "p50":        round(_percentile(values, 50) * 1000, 3),
+            "p99":        round(_percentile(values, 99) * 1000, 3),
+            "mean":       round(statistics.fmean(values) * 1000, 3),
+        }
+    return result
+
+def print_report(name: str, result: dict):
+    print(f"\n== {name} ({result['elapsed_sec']}s)")
+    print(f"  {'metric':<22}{'n':>7}{'per sec':>10}{'p50 ms':>10}{'p99 ms':>10}{'mean ms':>10}")
+    for metric, row in result["latency_ms"].items():
+        print(f"  {metric:<22}{row['n']:>7}{row['per_sec']:>10}{row['p50']:>10}{row['p99']:>10}{row['mean']:>10}")
+    for counter, value in sorted(result["counts"].items()):
+        print(f"  {counter:<22}{value:>7}")
+
+# ── Fake backend ───────────────────────────────────────────────────────────────
+def _fake_jwt(ttl_sec: int = 3600) -> str:
+    payload = json.dumps({"sub": "bench", "exp": int(time.time()) + ttl_sec}).encode()
+    body = base64.urlsafe_b64encode(payload).decode().rstrip("=")
+    return f"e30.{body}.sig"
+
+def make_track(index: int) -> dict:
+    words = [WORDS[(index * 7 + k * 3) % len(WORDS)] for k in range(3)]
+    return {
+        "videoId":      f"vid{index:06d}",
+        "title":        " ".join(words).title() + f" {index}",
+        "artist":       f"Artist {index % 97}",
+        "album":        None,
+        "durationMs":   30_000,
+        "thumbnailUrl": None,
+        "isExplicit":   False,
+    }
+
+class FakeBackend:
+    """
+    aiohttp stand-in for the backend endpoints the bot uses. Rooms are
+    multiplexed (room_mux) like the real backend. Events pushed with
+    broadcast() are timestamped so time-to-audio can be measured.
+    """
+    def __init__(self, samples: Samples, audio_path: str | None, search_latency_ms: float, catalog: int):
+        self.samples    = samples
+        self.audio_path = audio_path
+        self.search_latency_ms = search_latency_ms
+        self.catalog    = [make_track(i) for i in range(catalog)]
+        self.url        = ""
+        self.rooms: dict[str, dict] = {}                # code -> playback
+        self.members: dict[str, set] = {}               # code -> {ws}
+        self.sent_at: dict[tuple[str, str], list] = {}  # (room, videoId) -> [now_playing time, guilds yet to play it]
+        self.guilds: dict[str, int] = {}                # code -> guilds with voice in the room
+        self.binary: set = set()                        # sockets that asked for MessagePack
+        self._runner: web.AppRunner | None = None
+
+    def reset(self):
+        """Forget rooms and pending timestamps so scenarios do not see each other's."""
+        self.rooms.clear()
+        self.members.clear()
+        self.sent_at.clear()
+        self.guilds.clear()
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_post("/api/auth/login", self._login)
+        app.router.add_get("/api/search", self._search)
+        app.router.add_get("/api/media/resolve/{video_id}", self._resolve)
+        app.router.add_get("/stream/{video_id}", self._stream)
+        app.router.add_get("/ws", self._ws)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, "127.0.0.1", 0).start()
+        host, port = self._runner.addresses[0][:2]
+        self.url = f"http://{host}:{port}"
+
+    async def stop(self):
+        for sockets in self.members.values():
+            for ws in list(sockets):
+                await ws.close()
+        if self._runner:
+            await self._runner.cleanup()
+
+    async def _login(self, _request):
+        self.samples.count("backend_logins")
+        return web.json_response({"token": _fake_jwt()})
+
+    async def _search(self, request):
+        self.samples.count("backend_searches")
+        query = request.query.get("q", "").lower()
+        limit = int(request.query.get("limit", "25"))
+        await asyncio.sleep(random.uniform(0.5, 1.5) * self.search_latency_ms / 1000)
+        terms = query.split()
+        results = [t for t in self.catalog if all(term in t["title"].lower() for term in terms)]
+        return web.json_response({"results": results[:limit]})
+
+    async def _resolve(self, request):
+        self.samples.count("backend_resolves")
+        video_id = request.match_info["video_id"]
+        return web.json_response({
+            "source":          "worker",
+            "streamProxyUrl":  f"{self.url}/stream/{video_id}",
+            "contentType":     "audio/opus",
+        })
+
+    async def _stream(self, _request):
+        if not self.audio_path:
+            return web.Response(status=404)
+        return web.FileResponse(self.audio_path, headers={"Content-Type": "audio/ogg"})
+
+    async def _send(self, ws, message: dict):
+        """Sends in the encoding the socket asked for, counting wire bytes."""
+        if ws in self.binary:
+            frame = msgpack.packb(message)
+            await ws.send_bytes(frame)
+        else:
+            frame = json.dumps(message)
+            await ws.send_str(frame)
+        self.samples.count("ws_bytes", len(frame))
+
+    async def _ws(self, request):
+        ws = web.WebSocketResponse(compress=True)
+        await ws.prepare(request)
+        await ws.send_json({"event": "auth_required", "data": {}})
+        joined: set[str] = set()
+        async for msg in ws:
+            try:
+                payload = json.loads(msg.data)
+            except (TypeError, ValueError):
+                continue
+            event, room, data = payload.get("event"), payload.get("room"), payload.get("data") or {}
+            if event == "auth":
+                if data.get("encoding") == "msgpack":
+                    self.binary.add(ws)
+                await self._send(ws, {"event": "connected", "data": {
+                    "userId": "bench", "features": ["room_mux", "msgpack", "compress"],
+                    "encoding": "msgpack" if ws in self.binary else "json", "compress": ws.compress != 0,
+                }})
+            elif event == "join_room":
+                code = data.get("code")
+                joined.add(code)
+                self.members.setdefault(code, set()).add(ws)
+                playback = self.rooms.setdefault(code, self._new_playback())
+                await self._send(ws, {
+                    "event": "room_state", "room": code,
+                    "data": {"room": {"code": code}, "playback": playback, "members": [], "isHost": True},
+                })
+            elif event == "leave_room" and room:
+                joined.discard(room)
+                self.members.get(room, set()).discard(ws)
+            elif event == "playback_skip" and room in self.rooms:
+                await self.advance(room)
+            elif event == "playback_position_report":
+                self.samples.count("position_reports")
+        for code in joined:
+            self.members.get(code, set()).discard(ws)
+        self.binary.discard(ws)
+        return ws
+
+    def _new_playback(self) -> dict:
+        queue = random.sample(self.catalog, 5)
+        return {
+            "currentItem": None, "positionMs": 0, "serverTime": int(time.time() * 1000),
+            "isPlaying": True, "queue": queue, "autoplayQueue": [],
+        }
+
+    async def broadcast(self, room: str, event: str, data: dict):
+        if event == "now_playing" and data.get("currentItem"):
+            self.sent_at[(room, data["currentItem"]["videoId"])] = [time.perf_counter(), self.guilds.get(room, 1)]
+        for ws in list(self.members.get(room, ())):
+            await self._send(ws, {"event": event, "room": room, "data": data})
+
+    async def advance(self, room: str, track: dict | None = None):
+        """Start the next queued track (or `track`) and announce it."""
+        playback = self.rooms[room]
+        queue = playback["queue"]
+        if track is None:
+            track = queue.pop(0) if queue else random.choice(self.catalog)
+        playback.update(currentItem=track, positionMs=0, serverTime=int(time.time() * 1000), isPlaying=True)
+        if len(queue) < 3:
+            queue.extend(random.sample(self.catalog, 3))
+        await self.broadcast(room, "now_playing", playback)
+
+    async def seek(self, room: str, position_ms: int):
+        playback = self.rooms[room]
+        playback.update(positionMs=position_ms, serverTime=int(time.time() * 1000))
+        await self.broadcast(room, "playback_seek", playback)
+
+    async def reshuffle(self, room: str):
+        playback = self.rooms[room]
+        random.shuffle(playback["queue"])
+        playback["queue"].insert(0, random.choice(self.catalog))
+        await self.broadcast(room, "queue_updated", {"queue": playback["queue"], "autoplayQueue": []})
+
+# ── Fake voice ─────────────────────────────────────────────────────────────────
+class FakeVoiceClient:
+    """
+    The parts of discord.VoiceClient that main.py uses. A thread reads one
+    frame every 20 ms like discord.py's AudioPlayer and drops the packets;
+    the first frame of each track is reported for time-to-audio.
+    """
+    def __init__(self, room: str, bench: "Bench"):
+        self.room    = room
+        self.bench   = bench
+        self.source  = None
+        self._thread: threading.Thread | None = None
+        self._stop   = threading.Event()
+        self._resumed = threading.Event()
+        self._resumed.set()
+        self._after  = None
+        self._connected = True
+        self._last_video_id = None
+        # One listener, so the bot's idle handling never suspends playback
+        self.channel = SimpleNamespace(members=[SimpleNamespace(bot=False)])
+
+    def is_connected(self) -> bool:
+        return self._connected
+
+    def is_playing(self) -> bool:
+        return self._thread is not None and self._thread.is_alive() and self._resumed.is_set()
+
+    def is_paused(self) -> bool:
+        return self._thread is not None and self._thread.is_alive() and not self._resumed.is_set()
+
+    def play(self, source, *, after=None):
+        self.source = source
+        self._after = after
+        self._stop  = threading.Event()
+        self._resumed.set()
+        self._thread = threading.Thread(target=self._run, args=(source, self._stop, after), daemon=True)
+        self._thread.start()
+
+    def _run(self, source, stop: threading.Event, after):
+        error = None
+        next_at = time.perf_counter()
+        try:
+            while not stop.is_set():
+                if not self._resumed.wait(0.1):
+                    next_at = time.perf_counter()
+                    continue
+                data = source.read()
+                if not data:
+                    break
+                track = getattr(source, "track", None) or {}
+                video_id = track.get("videoId")
+                if video_id != self._last_video_id:
+                    self._last_video_id = video_id
+                    self.bench.first_frame(self.room, video_id)
+                self.bench.samples.count("frames_sent")
+                next_at += FRAME_SEC
+                time.sleep(max(0.0, next_at - time.perf_counter()))
+        except Exception as e:
+            error = e
+        finally:
+            if after:
+                after(error)
+            source.cleanup()
+
+    def stop(self):
+        self._stop.set()
+        self._resumed.set()
+
+    def pause(self):
+        self._resumed.clear()
+
+    def resume(self):
+        self._resumed.set()
+
+    async def disconnect(self, force: bool = False):
+        self._connected = False
+        self.stop()
+
+class FakeOpusSource:
+    """In-process replacement for the FFmpeg decoder (--fake-decoder)."""
+    FRAME = b"\xfc\xff\xfe" + bytes(157)  # A silent 20 ms Opus packet plus padding
+
+    def __init__(self, duration_ms: int, start_ms: int = 0):
+        self._remaining = max(0, (duration_ms - start_ms) // 20)
+
+    def read(self) -> bytes:
+        if self._remaining <= 0:
+            return b""
+        self._remaining -= 1
+        return self.FRAME
+
+    def is_opus(self) -> bool:
+        return True
+
+    def cleanup(self):
+        self._remaining = 0
+
+# ── Harness ────────────────────────────────────────────────────────────────────
+def _ensure_audio(path: str | None, workdir: str) -> str | None:
+    if path:
+        return path
+    if not shutil.which("ffmpeg"):
+        return None
+    out = os.path.join(workdir, "tone.opus")
+    subprocess.run(
+        ["ffmpeg", "-loglevel", "error", "-y", "-f", "lavfi", "-i", "sine=frequency=440:duration=30",
+         "-c:a", "libopus", "-b:a", "96k", out],
+        check=True,
+    )
+    return out
+
+class Bench:
+    def __init__(self, args):
+        self.args    = args
+        self.samples = Samples()
+        self.backend: FakeBackend | None = None
+        self.main    = None
+        self.loop: asyncio.AbstractEventLoop | None = None
+        self._guild_ids = iter(range(1_000_000, 2_000_000))
+
+    def first_frame(self, room: str, video_id: str | None):
+        if self.backend is None:
+            return
+        key  = (room, video_id)
+        sent = self.backend.sent_at.get(key)
+        if sent is None:
+            return
+        self.samples.add("time_to_audio", time.perf_counter() - sent[0])
+        sent[1] -= 1
+        if sent[1] <= 0:  # Every guild in the room has played it
+            self.backend.sent_at.pop(key, None)
+
+    async def setup(self, workdir: str):
+        self.loop = asyncio.get_running_loop()
+        audio_path = None if self.args.fake_decoder else _ensure_audio(self.args.audio, workdir)
+        self.backend = FakeBackend(self.samples, audio_path, self.args.search_latency_ms, self.args.catalog)
+        await self.backend.start()
+
+        os.environ.update({
+            "BACKEND_URL":           self.backend.url,
+            "BACKEND_WS_URL":        self.backend.url.replace("http", "ws", 1) + "/ws",
+            "BOT_AUDIO_CACHE_BYTES": "0",
+            "BOT_SESSION_DB":        "",
+            "BOT_METRICS_PORT":      "0",
+            "BOT_SHARD_COUNT":       "1",
+            "BOT_WS_BINARY":         "false" if self.args.ws_json else "true",
+            "BOT_WS_COMPRESS":       "false" if self.args.ws_json else "true",
+            "BOT_LOG_LEVEL":         "DEBUG" if self.args.verbose else "WARNING",
+        })
+        for key in ("DISCORD_TOKEN", "DISCORD_CLIENT_ID", "BOT_BACKEND_USERNAME", "BOT_BACKEND_PASSWORD"):
+            os.environ.setdefault(key, "bench")
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        import main
+        self.main = main
+
+        handle = main._handle_ws_message
+        async def timed_handle(state, msg):
+            start = time.perf_counter()
+            try:
+                await handle(state, msg)
+            finally:
+                self.samples.add(f"event:{msg.get('event')}", time.perf_counter() - start)
+        main._handle_ws_message = timed_handle
+
+        make_source = main._make_ffmpeg_source
+        def counted_source(source_info, position_ms=0, video_id=None):
+            self.samples.count("decoders_started")
+            if audio_path is None:
+                track = main.track_index.get(video_id) if video_id else None
+                return FakeOpusSource((track or {}).get("durationMs", 30_000), position_ms)
+            return make_source(source_info, position_ms, video_id)
+        main._make_ffmpeg_source = counted_source
+
+        observe = main.FFMPEG_STARTUP_SECONDS.observe
+        def recorded_startup(seconds, **labels):
+            self.samples.add(f"ffmpeg:{labels.get('profile')}", seconds)
+            observe(seconds, **labels)
+        main.FFMPEG_STARTUP_SECONDS.observe = recorded_startup
+        if audio_path is None:
+            print("[Bench] Using the in-process fake decoder (no FFmpeg)")
+
+    async def add_guilds(self, count: int) -> list:
+        states = []
+        for i in range(count):
+            room = f"R{i // self.args.guilds_per_room:05d}"
+            state = self.main.get_guild_state(next(self._guild_ids))
+            state.voice_client = FakeVoiceClient(room, self)
+            self.backend.guilds[room] = self.backend.guilds.get(room, 0) + 1
+            await self.main._connect_room(state, room)
+            states.append((room, state))
+        await asyncio.sleep(0.5)  # Let auth, joins and room_state settle
+        return states
+
+    async def remove_guilds(self, states: list):
+        for _, state in states:
+            await self.main._cleanup_state(state)
+        await asyncio.sleep(0.2)
+
+    async def teardown(self):
+        if self.main is not None:
+            await self.main.backend.close()
+        if self.backend:
+            await self.backend.stop()
+
+# ── Scenarios ──────────────────────────────────────────────────────────────────
+def _rooms(states: list) -> list[str]:
+    return sorted({room for room, _ in states})
+
+async def scenario_churn(bench: Bench):
+    states = await bench.add_guilds(bench.args.guilds)
+    for _ in range(bench.args.rounds):
+        for room in _rooms(states):
+            if random.random() < 0.5:
+                await bench.backend.reshuffle(room)
+            # Mostly play what is queued next (the warm path), sometimes jump
+            queue = bench.backend.rooms[room]["queue"]
+            track = queue.pop(0) if queue and random.random() < 0.7 else random.choice(bench.backend.catalog)
+            await bench.backend.advance(room, track)
+        await asyncio.sleep(bench.args.interval_ms / 1000)
+    await asyncio.sleep(1.0)
+    await bench.remove_guilds(states)
+
+async def scenario_seek(bench: Bench):
+    states = await bench.add_guilds(bench.args.guilds)
+    for room in _rooms(states):
+        await bench.backend.advance(room)
+    await asyncio.sleep(1.0)
+    for _ in range(bench.args.rounds):
+        for room in _rooms(states):
+            for _ in range(bench.args.seeks_per_burst):
+                await bench.backend.seek(room, random.randint(0, 25_000))
+                await asyncio.sleep(0.01)
+        await asyncio.sleep(bench.args.interval_ms / 1000)
+    await asyncio.sleep(1.0)
+    await bench.remove_guilds(states)
+
+async def scenario_autocomplete(bench: Bench):
+    main = bench.main
+
+    async def keystroke(user_id: int, text: str):
+        interaction = SimpleNamespace(user=SimpleNamespace(id=user_id), guild_id=None)
+        start = time.perf_counter()
+        choices = await main.autocomplete_add(interaction, text)
+        bench.samples.add("autocomplete", time.perf_counter() - start)
+        bench.samples.count("autocomplete_choices", len(choices))
+
+    async def user(user_id: int):
+        query = " ".join(random.sample(WORDS, 2))
+        tasks = []
+        for i in range(1, len(query) + 1):
+            # Discord fires each keystroke as its own interaction
+            tasks.append(asyncio.create_task(keystroke(user_id, query[:i])))
+            await asyncio.sleep(random.uniform(0.04, 0.12))
+        await asyncio.gather(*tasks)
+
+    for burst in range(bench.args.rounds):
+        await asyncio.gather(*(user(burst * 10_000 + u) for u in range(bench.args.users)))
+
+SCENARIOS = {
+    "churn":        scenario_churn,
+    "seek":         scenario_seek,
+    "autocomplete": scenario_autocomplete,
+}
+
+# ── Entry point ────────────────────────────────────────────────────────────────
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    regressions = []
+    for scenario, result in results.items():
+        for metric, row in result["latency_ms"].items():
+            base = baseline.get(scenario, {}).get("latency_ms", {}).get(metric)
+            if base and row["p99"] > base["p99"] * (1 + tolerance) and row["p99"] - base["p99"] > 1:
+                regressions.append(f"{scenario}/{metric}: p99 {row['p99']}ms vs {base['p99']}ms")
+    return regressions
+
+async def run(args) -> dict:
+    random.seed(args.seed)
+    bench = Bench(args)
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        try:
+            await bench.setup(workdir)
+            for name in args.scenarios or list(SCENARIOS):
+                bench.samples = Samples()
+                bench.backend.samples = bench.samples
+                bench.backend.reset()
+                start = time.perf_counter()
+                await SCENARIOS[name](bench)
+                results[name] = summarize(bench.samples, time.perf_counter() - start)
+                print_report(name, results[name])
+        finally:
+            await bench.teardown()
+    return results
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmark for the SpotiSync bot")
+    parser.add_argument("scenarios", nargs="*", help=f"Scenarios to run: {', '.join(SCENARIOS)} (default: all)")
+    parser.add_argument("--guilds", type=int, default=20, help="Guilds")
+    parser.add_argument("--guilds-per-room", type=int, default=1, help="Guilds joined to each room")
+    parser.add_argument("--users", type=int, default=20, help="Concurrent typists for autocomplete")
+    parser.add_argument("--rounds", type=int, default=5, help="Rounds per scenario")
+    parser.add_argument("--interval-ms", type=int, default=1500, help="Pause between rounds")
+    parser.add_argument("--seeks-per-burst", type=int, default=10)
+    parser.add_argument("--search-latency-ms", type=float, default=80, help="Fake backend search latency")
+    parser.add_argument("--catalog", type=int, default=2000, help="Tracks known to the fake backend")
+    parser.add_argument("--audio", help="Audio file to stream (default: a generated 30 s tone)")
+    parser.add_argument("--fake-decoder", action="store_true", help="Skip FFmpeg and decode nothing")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="Write results to this file")
+    parser.add_argument("--compare", help="Baseline results file; exit 1 if a p99 regressed")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed p99 increase for --compare")
+    parser.add_argument("--ws-json", action="store_true", help="Use plain JSON WebSocket frames")
+    parser.add_argument("--verbose", action="store_true", help="Keep the bot's own log output")
+    args = parser.parse_args(argv)
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(sorted(unknown))}")
+    return args
+
+def main_cli(argv=None) -> int:
+    args = parse_args(argv)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    if not args.fake_decoder and not args.audio and not shutil.which("ffmpeg"):
+        args.fake_decoder = True
+    results = asyncio.run(run(args))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    if baseline is not None:
+        regressions = compare(results, baseline, args.tolerance)
+        for line in regressions:
+            print(f"[Bench] Regression: {line}")
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -1,16 +1,40 @@
 import asyncio
+import atexit
 import base64
+import hashlib
 import json
+import logging
+import logging.handlers
 import os
+import queue
+import random
+import re
+import shlex
+import signal
+import sqlite3
+import subprocess
+import sys
+import threading
 import time
+import uuid
+import weakref
+from bisect import bisect_left, insort
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+from typing import TYPE_CHECKING
 from urllib.parse import quote
 
 import aiohttp
 import discord
 from discord import app_commands
+from discord.oggparse import OggStream
 from discord.ui import View, Button
 from dotenv import load_dotenv
 
+if TYPE_CHECKING:
+    from aiohttp import web
+
 load_dotenv()
 
 # ── Helpers (defined before use) ───────────────────────────────────────────────
@@ -40,69 +64,532 @@ BOT_BACKEND_USERNAME = os.getenv("BOT_BACKEND_USERNAME", "")
 BOT_BACKEND_PASSWORD = os.getenv("BOT_BACKEND_PASSWORD", "")
 BOT_COOKIE_METHOD    = os.getenv("BOT_COOKIE_METHOD", "")
 OWNER_ID             = int(os.getenv("OWNER_ID", "756572353911062550"))
+BOT_PREFETCH_LEAD_MS = int(os.getenv("BOT_PREFETCH_LEAD_MS", "30000"))
+BOT_RESOLVE_TTL_SEC  = float(os.getenv("BOT_RESOLVE_TTL_SEC", "90"))
+BOT_WS_POOL_SIZE     = int(os.getenv("BOT_WS_POOL_SIZE", "1"))
+BOT_HTTP_POOL_SIZE   = int(os.getenv("BOT_HTTP_POOL_SIZE", "32"))
+BOT_WS_BINARY           = os.getenv("BOT_WS_BINARY", "true").lower() != "false"
+BOT_WS_COMPRESS         = os.getenv("BOT_WS_COMPRESS", "true").lower() != "false"
+BOT_WS_BACKOFF_BASE_MS  = int(os.getenv("BOT_WS_BACKOFF_BASE_MS", "1000"))
+BOT_WS_BACKOFF_MAX_MS   = int(os.getenv("BOT_WS_BACKOFF_MAX_MS", "60000"))
+BOT_RESYNC_TOLERANCE_MS = int(os.getenv("BOT_RESYNC_TOLERANCE_MS", "3000"))
+BOT_POSITION_REPORT_SEC = float(os.getenv("BOT_POSITION_REPORT_SEC", "5"))
+BOT_DRIFT_THRESHOLD_MS  = int(os.getenv("BOT_DRIFT_THRESHOLD_MS", "2000"))
+BOT_SEEK_DEBOUNCE_MS    = int(os.getenv("BOT_SEEK_DEBOUNCE_MS", "150"))
+BOT_SEEK_BUFFER_BYTES   = int(os.getenv("BOT_SEEK_BUFFER_BYTES", str(8 * 1024 * 1024)))
+BOT_SEEK_FORWARD_MAX_MS = int(os.getenv("BOT_SEEK_FORWARD_MAX_MS", "20000"))
+BOT_OPUS_PASSTHROUGH    = os.getenv("BOT_OPUS_PASSTHROUGH", "true").lower() != "false"
+BOT_OPUS_BITRATE_KBPS   = int(os.getenv("BOT_OPUS_BITRATE_KBPS", "128"))
+BOT_AUDIO_FANOUT        = os.getenv("BOT_AUDIO_FANOUT", "true").lower() != "false"
+# No -reconnect: relay proxy URLs are single-use (the session ends when the
+# client disconnects), so a re-request could only stall before failing.
+BOT_FFMPEG_STREAM_OPTIONS = os.getenv(
+    "BOT_FFMPEG_STREAM_OPTIONS", "-probesize 65536 -analyzeduration 0 -fflags +nobuffer"
+)
+BOT_FFMPEG_FILE_OPTIONS = os.getenv("BOT_FFMPEG_FILE_OPTIONS", "-probesize 32768 -analyzeduration 0")
+BOT_AUDIO_CACHE_DIR     = os.getenv("BOT_AUDIO_CACHE_DIR", ".audio_cache")
+BOT_AUDIO_CACHE_BYTES   = int(os.getenv("BOT_AUDIO_CACHE_BYTES", str(1024 ** 3)))
+BOT_METRICS_PORT        = int(os.getenv("BOT_METRICS_PORT", "0"))
+BOT_METRICS_HOST        = os.getenv("BOT_METRICS_HOST", "127.0.0.1")
+BOT_CONTROLS_EDIT_INTERVAL_MS = int(os.getenv("BOT_CONTROLS_EDIT_INTERVAL_MS", "1500"))
+BOT_STATE_DIR           = os.getenv("BOT_STATE_DIR", ".bot_state")
+BOT_SYNC_COMMANDS       = os.getenv("BOT_SYNC_COMMANDS", "auto").lower()  # auto | always | never
+BOT_SESSION_DB          = os.getenv("BOT_SESSION_DB", os.path.join(BOT_STATE_DIR, "sessions.sqlite3"))
+BOT_SESSION_SAVE_SEC    = float(os.getenv("BOT_SESSION_SAVE_SEC", "5"))
+BOT_SESSION_MAX_AGE_SEC = float(os.getenv("BOT_SESSION_MAX_AGE_SEC", str(6 * 3600)))
+BOT_RESUME_CONCURRENCY  = int(os.getenv("BOT_RESUME_CONCURRENCY", "4"))
+BOT_IDLE_SUSPEND_SEC    = float(os.getenv("BOT_IDLE_SUSPEND_SEC", "60"))
+BOT_IDLE_DISCONNECT_SEC = float(os.getenv("BOT_IDLE_DISCONNECT_SEC", "900"))
+BOT_LOG_LEVEL           = os.getenv("BOT_LOG_LEVEL", "INFO").upper()
+BOT_LOG_FORMAT          = os.getenv("BOT_LOG_FORMAT", "text").lower()
+BOT_LOG_BURST           = int(os.getenv("BOT_LOG_BURST", "10"))
+BOT_LOG_WINDOW_SEC      = float(os.getenv("BOT_LOG_WINDOW_SEC", "60"))
+BOT_SHARD_COUNT         = int(os.getenv("BOT_SHARD_COUNT", "1"))
+BOT_SHARDS_PER_PROCESS  = int(os.getenv("BOT_SHARDS_PER_PROCESS", "1"))
+# Set by the shard supervisor for the processes it spawns, not by hand.
+BOT_SHARD_IDS           = [int(i) for i in os.getenv("BOT_SHARD_IDS", "").split(",") if i.strip()]
+BOT_SUPERVISOR_URL      = os.getenv("BOT_SUPERVISOR_URL", "")
+BOT_SUPERVISOR_SECRET   = os.getenv("BOT_SUPERVISOR_SECRET", "")
+BOT_SEARCH_CACHE_TTL_SEC = float(os.getenv("BOT_SEARCH_CACHE_TTL_SEC", "300"))
+BOT_SEARCH_CACHE_BYTES   = int(os.getenv("BOT_SEARCH_CACHE_BYTES", str(8 * 1024 * 1024)))
+BOT_TRACK_CACHE_SIZE     = int(os.getenv("BOT_TRACK_CACHE_SIZE", "5000"))
+BOT_AUTOCOMPLETE_LOCAL_MIN   = int(os.getenv("BOT_AUTOCOMPLETE_LOCAL_MIN", "5"))
+BOT_AUTOCOMPLETE_DEADLINE_MS = int(os.getenv("BOT_AUTOCOMPLETE_DEADLINE_MS", "2500"))
+BOT_BULK_ADD_MAX         = int(os.getenv("BOT_BULK_ADD_MAX", "100"))
+BOT_BULK_ADD_CONCURRENCY = int(os.getenv("BOT_BULK_ADD_CONCURRENCY", "6"))
 
 if not DISCORD_TOKEN or not DISCORD_CLIENT_ID:
     raise RuntimeError("[Bot] Missing DISCORD_TOKEN or DISCORD_CLIENT_ID")
 if not BOT_BACKEND_USERNAME or not BOT_BACKEND_PASSWORD:
     raise RuntimeError("[Bot] Missing BOT_BACKEND_USERNAME or BOT_BACKEND_PASSWORD")
 
-# ── Backend auth ───────────────────────────────────────────────────────────────
-_backend_token: str | None = None
-_backend_token_exp: float = 0.0
+# ── Logging ────────────────────────────────────────────────────────────────────
+# Log calls only build a LogRecord and put it on a queue; a listener thread
+# formats and writes it, so container log I/O never blocks the event loop or
+# the audio thread. Messages use %-style arguments (formatted on the listener
+# thread), which also gives each message a stable template for rate limiting.
+_log_context: ContextVar[dict | None] = ContextVar("log_context", default=None)
+
+def _ctx(state=None, **fields) -> dict:
+    """extra= for a log call: per-guild fields plus anything given."""
+    if state is not None:
+        fields = {"guild": state.guild_id, "room": state.room_code, **fields}
+    return {"ctx": fields}
+
+class _ContextFilter(logging.Filter):
+    """Merges the current task's log context (see _dispatch) into the record."""
+    def filter(self, record: logging.LogRecord) -> bool:
+        current = _log_context.get()
+        if current:
+            record.ctx = {**current, **getattr(record, "ctx", {})}
+        return True
 
-async def _login_backend(session: aiohttp.ClientSession) -> str:
-    global _backend_token, _backend_token_exp
-    async with session.post(
-        f"{BACKEND_URL}/api/auth/login",
-        json={"username": BOT_BACKEND_USERNAME, "password": BOT_BACKEND_PASSWORD},
-    ) as resp:
-        if not resp.ok:
-            text = await resp.text()
-            raise RuntimeError(f"Backend login failed ({resp.status}): {text}")
-        data = await resp.json()
-    _backend_token = data.get("token") or data.get("accessToken")
-    if not _backend_token:
-        raise RuntimeError("Backend login did not return a token")
-    _backend_token_exp = _parse_jwt_exp(_backend_token)
-    print("[Auth] Backend token acquired")
-    return _backend_token
-
-async def _get_backend_token(session: aiohttp.ClientSession) -> str:
-    now = time.time() * 1000
-    if not _backend_token or (_backend_token_exp and now > _backend_token_exp - 30_000):
-        return await _login_backend(session)
-    return _backend_token
-
-async def _api_fetch(
-    session: aiohttp.ClientSession,
-    path: str,
-    method: str = "GET",
-    **kwargs,
-) -> aiohttp.ClientResponse:
-    """Authenticated HTTP request. Auto-retries once on 401."""
-    token = await _get_backend_token(session)
-    headers = kwargs.pop("headers", {})
-    headers["Authorization"] = f"Bearer {token}"
-    headers.setdefault("Content-Type", "application/json")
-    resp = await session.request(method, f"{BACKEND_URL}{path}", headers=headers, **kwargs)
-    if resp.status == 401:
-        token = await _login_backend(session)
-        headers["Authorization"] = f"Bearer {token}"
-        resp = await session.request(method, f"{BACKEND_URL}{path}", headers=headers, **kwargs)
-    return resp
+class _RepeatFilter(logging.Filter):
+    """
+    Lets each warning/error template through at most `burst` times per
+    `window` seconds; the first one after a quiet window reports how many
+    were dropped.
+    """
+    def __init__(self, burst: int, window: float):
+        super().__init__()
+        self.burst  = burst
+        self.window = window
+        self._lock  = threading.Lock()
+        self._seen: dict[tuple, list] = {}  # (logger, template) -> [window start, count]
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno < logging.WARNING or self.burst <= 0:
+            return True
+        key = (record.name, record.msg)
+        now = time.monotonic()
+        with self._lock:
+            seen = self._seen.get(key)
+            if seen is None or now - seen[0] >= self.window:
+                if len(self._seen) > 1000:
+                    self._seen.clear()
+                if seen and seen[1] > self.burst:
+                    record.suppressed = seen[1] - self.burst
+                self._seen[key] = [now, 1]
+                return True
+            seen[1] += 1
+            return seen[1] <= self.burst
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record  # Formatting happens on the listener thread
+
+class _TextFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        tag  = record.name.rpartition(".")[2]
+        line = f"{self.formatTime(record)} {record.levelname:<7} [{tag}] {record.getMessage()}"
+        ctx  = getattr(record, "ctx", None)
+        if ctx:
+            line += " " + " ".join(f"{k}={v}" for k, v in ctx.items() if v is not None)
+        if getattr(record, "suppressed", 0):
+            line += f" (+{record.suppressed} similar suppressed)"
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+class _JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts":        round(record.created, 3),
+            "level":     record.levelname.lower(),
+            "component": record.name.rpartition(".")[2],
+            "msg":       record.getMessage(),
+            **(getattr(record, "ctx", None) or {}),
+        }
+        if getattr(record, "suppressed", 0):
+            entry["suppressed"] = record.suppressed
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+def _setup_logging() -> logging.handlers.QueueListener:
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(_JsonFormatter() if BOT_LOG_FORMAT == "json" else _TextFormatter())
+    handler = _QueueHandler(queue.SimpleQueue())
+    handler.addFilter(_ContextFilter())
+    handler.addFilter(_RepeatFilter(BOT_LOG_BURST, BOT_LOG_WINDOW_SEC))
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(BOT_LOG_LEVEL)
+    listener = logging.handlers.QueueListener(handler.queue, output)
+    listener.start()
+    atexit.register(listener.stop)  # Flushes what is still queued
+    return listener
+
+_log_listener = _setup_logging()
+
+auth_log     = logging.getLogger("spotisync.Auth")
+relay_log    = logging.getLogger("spotisync.Relay")
+cache_log    = logging.getLogger("spotisync.Cache")
+bot_log      = logging.getLogger("spotisync.Bot")
+controls_log = logging.getLogger("spotisync.Controls")
+ws_log       = logging.getLogger("spotisync.WS")
+audio_log    = logging.getLogger("spotisync.Audio")
+clock_log    = logging.getLogger("spotisync.Clock")
+prefetch_log = logging.getLogger("spotisync.Prefetch")
+voice_log    = logging.getLogger("spotisync.Voice")
+search_log   = logging.getLogger("spotisync.Autocomplete")
+metrics_log  = logging.getLogger("spotisync.Metrics")
+shards_log   = logging.getLogger("spotisync.Shards")
+
+# ── Metrics ────────────────────────────────────────────────────────────────────
+# Minimal Prometheus text-format metrics, served on BOT_METRICS_PORT when set.
+# Observations may come from the audio thread, hence the lock.
+_metrics_lock = threading.Lock()
+_metrics: list = []
+
+def _label_str(names: tuple, values: tuple, le: str | None = None) -> str:
+    pairs = list(zip(names, values))
+    if le is not None:
+        pairs.append(("le", le))
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape_label(v)}"' for n, v in pairs) + "}"
+
+def _escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name, self.help, self.labels = name, help, labels
+        self._values: dict[tuple, float] = {}
+        _metrics.append(self)
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(labels.get(n, "") for n in self.labels)
+        with _metrics_lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_label_str(self.labels, key)} {value}")
+        return lines
+
+class Histogram:
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        self.name, self.help, self.labels, self.buckets = name, help, labels, buckets
+        self._values: dict[tuple, list] = {}  # key -> [bucket counts..., sum, count]
+        _metrics.append(self)
+
+    def observe(self, seconds: float, **labels):
+        key = tuple(labels.get(n, "") for n in self.labels)
+        with _metrics_lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            bucket = bisect_left(self.buckets, seconds)
+            if bucket < len(self.buckets):
+                entry[bucket] += 1
+            entry[-2] += seconds
+            entry[-1] += 1
+
+    def time(self, **labels) -> "_Timer":
+        return _Timer(self, labels)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, entry in sorted(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, entry):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_label_str(self.labels, key, str(bound))} {cumulative}")
+            lines.append(f"{self.name}_bucket{_label_str(self.labels, key, '+Inf')} {entry[-1]}")
+            lines.append(f"{self.name}_sum{_label_str(self.labels, key)} {entry[-2]}")
+            lines.append(f"{self.name}_count{_label_str(self.labels, key)} {entry[-1]}")
+        return lines
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "start")
+
+    def __init__(self, histogram: Histogram, labels: dict):
+        self.histogram, self.labels = histogram, labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+
+class Gauge:
+    """Sampled at scrape time from fn, so it never goes stale."""
+    def __init__(self, name: str, help: str, fn):
+        self.name, self.help, self.fn = name, help, fn
+        _metrics.append(self)
+
+    def render(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge", f"{self.name} {self.fn()}"]
+
+def _render_metrics() -> str:
+    with _metrics_lock:
+        return "\n".join(line for metric in _metrics for line in metric.render()) + "\n"
+
+RESOLVE_SECONDS = Histogram(
+    "spotisync_resolve_seconds", "Relay resolve latency (_resolve_audio_source)", ("outcome",)
+)
+BACKEND_REQUEST_SECONDS = Histogram(
+    "spotisync_backend_request_seconds", "Backend API request latency including retries", ("route", "method")
+)
+FIRST_AUDIO_SECONDS = Histogram(
+    "spotisync_first_audio_seconds", "Time from a now_playing event to the first audio frame sent"
+)
+WS_EVENT_SECONDS = Histogram(
+    "spotisync_ws_event_seconds", "Processing time per backend WS event", ("event",),
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5),
+)
+WS_RECONNECTS   = Counter("spotisync_ws_reconnects_total", "Backend WS reconnect attempts")
+BACKEND_RELOGINS = Counter("spotisync_backend_relogins_total", "Re-logins after a backend 401")
+FFMPEG_STARTUP_SECONDS = Histogram(
+    "spotisync_ffmpeg_startup_seconds", "Time from starting FFmpeg to its first audio packet, by input profile",
+    ("profile",), buckets=(0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1, 1.5, 2, 3, 5, 10),
+)
+PLAYBACK_ERRORS = Counter("spotisync_playback_errors_total", "Playback failures by stage", ("stage",))
+
+_ffmpeg_sources: "weakref.WeakSet[discord.FFmpegAudio]" = weakref.WeakSet()
+
+def _live_ffmpeg_processes() -> int:
+    return sum(
+        1 for source in list(_ffmpeg_sources)
+        if getattr(source, "_process", None) and source._process.returncode is None
+    )
+
+Gauge("spotisync_voice_clients", "Connected voice clients", lambda: len(bot.voice_clients))
+Gauge("spotisync_ffmpeg_processes", "Running FFmpeg decoder processes", _live_ffmpeg_processes)
+Gauge(
+    "spotisync_shared_decoders", "Room decoders played by more than one guild",
+    lambda: sum(1 for audio in list(_room_audio.values()) if audio.shared),
+)
+Gauge(
+    "spotisync_ws_sockets", "Open backend WS sockets",
+    lambda: sum(1 for sock in ws_manager.sockets if sock.ws is not None and not sock.ws.closed),
+)
+
+async def _start_metrics_server() -> "web.AppRunner":
+    from aiohttp import web  # Only needed when metrics are enabled
+    async def handle(_request):
+        return web.Response(text=_render_metrics(), content_type="text/plain", charset="utf-8")
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    # Each shard process gets its own port, offset by its first shard ID
+    port = BOT_METRICS_PORT + (BOT_SHARD_IDS[0] if BOT_SHARD_IDS else 0)
+    await web.TCPSite(runner, BOT_METRICS_HOST, port).start()
+    metrics_log.info("Serving on http://%s:%d/metrics", BOT_METRICS_HOST, port)
+    return runner
+
+# ── Backend client ─────────────────────────────────────────────────────────────
+# Timeout and retry budget per endpoint class. Retries only apply to GETs and
+# only to connection errors, timeouts and gateway statuses.
+_ENDPOINT_POLICIES = {
+    "auth":    (aiohttp.ClientTimeout(total=10, sock_connect=5), 0),
+    "search":  (aiohttp.ClientTimeout(total=5, sock_connect=3), 1),
+    "resolve": (aiohttp.ClientTimeout(total=45, sock_connect=5), 1),
+    "default": (aiohttp.ClientTimeout(total=15, sock_connect=5), 2),
+}
+_RETRY_STATUSES = {502, 503, 504}
+
+def _endpoint_class(path: str) -> str:
+    if path.startswith("/api/search"):
+        return "search"
+    if path.startswith("/api/media/resolve"):
+        return "resolve"
+    if path.startswith("/api/auth"):
+        return "auth"
+    return "default"
+
+def _retry_delay(attempt: int) -> float:
+    return min(2.0, 0.25 * 2 ** (attempt - 1)) * random.uniform(0.5, 1.0)
+
+class BackendResponse:
+    """A fully read backend response; the connection is already released."""
+    __slots__ = ("status", "body")
+
+    def __init__(self, status: int, body: bytes):
+        self.status = status
+        self.body   = body
+
+    @property
+    def ok(self) -> bool:
+        return self.status < 400
+
+    def text(self) -> str:
+        return self.body.decode("utf-8", "replace")
+
+    def json(self):
+        return json.loads(self.body) if self.body else None
+
+class BackendClient:
+    """
+    Shared HTTP client for the backend API: one keep-alive connection pool,
+    a single in-flight login at a time, and a background refresh that renews
+    the token before it expires so requests rarely wait on a login.
+    """
+    def __init__(self):
+        self._session: aiohttp.ClientSession | None = None
+        self._token: str | None = None
+        self._token_exp: float = 0.0
+        self._stale_token: str | None = None
+        self._login_task: asyncio.Task | None = None
+        self._refresh_task: asyncio.Task | None = None
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=BOT_HTTP_POOL_SIZE,
+                ttl_dns_cache=300,
+                keepalive_timeout=60,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=_ENDPOINT_POLICIES["default"][0],
+            )
+        return self._session
+
+    @property
+    def token(self) -> str | None:
+        return self._token
+
+    async def _login(self) -> str:
+        if BOT_SUPERVISOR_URL:
+            return await self._login_shared()
+        async with self.session.post(
+            f"{BACKEND_URL}/api/auth/login",
+            json={"username": BOT_BACKEND_USERNAME, "password": BOT_BACKEND_PASSWORD},
+            timeout=_ENDPOINT_POLICIES["auth"][0],
+        ) as resp:
+            if not resp.ok:
+                text = await resp.text()
+                raise RuntimeError(f"Backend login failed ({resp.status}): {text}")
+            data = await resp.json()
+        token = data.get("token") or data.get("accessToken")
+        if not token:
+            raise RuntimeError("Backend login did not return a token")
+        self._token     = token
+        self._token_exp = _parse_jwt_exp(token)
+        auth_log.info("Backend token acquired")
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._refresh_loop())
+        return token
+
+    async def _login_shared(self) -> str:
+        """
+        Shard processes take the supervisor's token instead of logging in
+        themselves; the supervisor refreshes it. A token we saw rejected is
+        passed along so the supervisor replaces it at most once.
+        """
+        data = await _supervisor_call("/token", {"stale": self._stale_token})
+        self._token       = data["token"]
+        self._token_exp   = _parse_jwt_exp(self._token)
+        self._stale_token = None
+        return self._token
+
+    async def login(self) -> str:
+        """Log in, sharing one request between all concurrent callers."""
+        if self._login_task is None or self._login_task.done():
+            self._login_task = asyncio.create_task(self._login())
+        return await asyncio.shield(self._login_task)
+
+    async def get_token(self) -> str:
+        now = time.time() * 1000
+        if not self._token or (self._token_exp and now > self._token_exp - 30_000):
+            return await self.login()
+        return self._token
+
+    async def _refresh_loop(self):
+        while self._token_exp:
+            remaining_ms = self._token_exp - time.time() * 1000
+            delay_ms = max(remaining_ms - 5 * 60_000, remaining_ms / 2)
+            await asyncio.sleep(max(1.0, delay_ms / 1000))
+            try:
+                await self.login()
+            except Exception as e:
+                auth_log.warning("Background token refresh failed: %s", e)
+                await asyncio.sleep(30)
+
+    async def request(self, path: str, method: str = "GET", **kwargs) -> BackendResponse:
+        """Authenticated request. Re-logs in once on 401; GETs retry with backoff."""
+        timeout, retries = _ENDPOINT_POLICIES[_endpoint_class(path)]
+        if method != "GET":
+            retries = 0
+        headers = kwargs.pop("headers", {})
+        headers.setdefault("Content-Type", "application/json")
+        with BACKEND_REQUEST_SECONDS.time(route=_endpoint_class(path), method=method):
+            return await self._request(path, method, headers, timeout, retries, **kwargs)
+
+    async def _request(self, path, method, headers, timeout, retries, **kwargs) -> BackendResponse:
+        attempt  = 0
+        relogged = False
+        while True:
+            token = await self.get_token()
+            headers["Authorization"] = f"Bearer {token}"
+            try:
+                async with self.session.request(
+                    method, f"{BACKEND_URL}{path}", headers=headers, timeout=timeout, **kwargs
+                ) as resp:
+                    status = resp.status
+                    body   = await resp.read()
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if attempt >= retries:
+                    raise
+                attempt += 1
+                await asyncio.sleep(_retry_delay(attempt))
+                continue
+            if status == 401 and not relogged:
+                relogged = True
+                BACKEND_RELOGINS.inc()
+                # Only the first caller holding the stale token drops it; the
+                # rest pick up the login that caller starts.
+                if self._token == token:
+                    self._token       = None
+                    self._stale_token = token
+                continue
+            if status in _RETRY_STATUSES and attempt < retries:
+                attempt += 1
+                await asyncio.sleep(_retry_delay(attempt))
+                continue
+            return BackendResponse(status, body)
+
+    async def close(self):
+        for task in (self._refresh_task, self._login_task):
+            if task and not task.done():
+                task.cancel()
+        if self._session and not self._session.closed:
+            await self._session.close()
+
+backend = BackendClient()
 
 # ── Audio relay ────────────────────────────────────────────────────────────────
-async def _resolve_audio_source(session: aiohttp.ClientSession, video_id: str) -> dict:
+async def _resolve_audio_source(video_id: str) -> dict:
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        source_info = await _resolve_audio_source_uncached(video_id)
+        outcome = "ok"
+        return source_info
+    finally:
+        RESOLVE_SECONDS.observe(time.perf_counter() - start, outcome=outcome)
+
+async def _resolve_audio_source_uncached(video_id: str) -> dict:
     qs = f"?cookieMethod={quote(BOT_COOKIE_METHOD)}" if BOT_COOKIE_METHOD else ""
-    print(f"[Relay] Resolving video={video_id}")
-    resp = await _api_fetch(session, f"/api/media/resolve/{quote(video_id)}{qs}")
-    print(f"[Relay] Resolve status={resp.status}")
+    relay_log.info("Resolving video=%s", video_id)
+    resp = await backend.request(f"/api/media/resolve/{quote(video_id)}{qs}")
+    relay_log.debug("Resolve status=%s video=%s", resp.status, video_id)
     if not resp.ok:
-        text = await resp.text()
-        print(f"[Relay] Resolve error body: {text}")
+        text = resp.text()
+        relay_log.warning("Resolve failed (%s) for video=%s: %s", resp.status, video_id, text)
         raise RuntimeError(f"Relay error ({resp.status}): {text}")
-    data = await resp.json()
-    print(f"[Relay] Resolve response: {data}")
+    data = resp.json()
+    relay_log.debug("Resolve response: %s", data)
     if not data:
         raise RuntimeError("Relay unavailable (empty response)")
 
@@ -110,7 +597,7 @@ async def _resolve_audio_source(session: aiohttp.ClientSession, video_id: str) -
         url = data.get("streamProxyUrl") or data.get("streamEndpoint")
         if not url:
             raise RuntimeError("Worker relay did not return a stream URL")
-        return {"url": url, "source": "worker"}
+        return {"url": url, "source": "worker", "contentType": data.get("contentType")}
 
     if data.get("source") == "legacy":
         reason = data.get("reason", "no worker available")
@@ -120,7 +607,346 @@ async def _resolve_audio_source(session: aiohttp.ClientSession, video_id: str) -
 
     raise RuntimeError("Relay did not return a usable stream URL")
 
+class ResolveCache:
+    """
+    Short-lived cache of relay resolves, keyed by videoId.
+    Worker proxy URLs are single-use and expire on the backend after
+    MEDIA_STREAM_PROXY_TTL_MS (2 min by default), so entries are handed out
+    once via take() and dropped after ttl_sec. Entries hold the resolve task
+    itself, so a track that changes while its prefetch is still in flight
+    joins that request instead of issuing a second one.
+    """
+    def __init__(self, ttl_sec: float):
+        self.ttl_sec = ttl_sec
+        self._entries: dict[str, tuple[float, asyncio.Task]] = {}
+
+    def _prune(self):
+        now = time.monotonic()
+        for video_id, (expires_at, task) in list(self._entries.items()):
+            if expires_at <= now:
+                del self._entries[video_id]
+                if not task.done():
+                    task.cancel()
+
+    def has(self, video_id: str) -> bool:
+        self._prune()
+        return video_id in self._entries
+
+    def start(self, video_id: str) -> asyncio.Task:
+        self._prune()
+        if video_id in self._entries:
+            return self._entries[video_id][1]
+        task = asyncio.create_task(_resolve_audio_source(video_id))
+        # Retrieve the exception so unused failed prefetches are not reported
+        # as "exception was never retrieved" when they are dropped.
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        self._entries[video_id] = (time.monotonic() + self.ttl_sec, task)
+        return task
+
+    def take(self, video_id: str) -> asyncio.Task | None:
+        self._prune()
+        entry = self._entries.pop(video_id, None)
+        return entry[1] if entry else None
+
+    def restore(self, video_id: str, task: asyncio.Task):
+        """Put back a taken, still unused resolve (its taker was cancelled)."""
+        self._entries.setdefault(video_id, (time.monotonic() + self.ttl_sec, task))
+
+    def clear(self):
+        for _, task in self._entries.values():
+            if not task.done():
+                task.cancel()
+        self._entries.clear()
+
+# ── Audio cache ────────────────────────────────────────────────────────────────
+class AudioCache:
+    """
+    On-disk cache of encoded Ogg/Opus audio keyed by videoId, filled as a side
+    effect of playback (see TeeOpusAudio). Each write goes to its own .part
+    file and is renamed into place only once FFmpeg has finished the whole
+    track, so a partial download is never served. The total size stays under
+    max_bytes by evicting the least recently played files. Methods may be
+    called from audio threads, hence the lock.
+
+    With shared=True (shard processes on one directory) each commit re-reads
+    the directory before evicting, so max_bytes bounds the combined size;
+    lookup() touches files, so their mtimes are the LRU order every process
+    sees.
+    """
+    def __init__(self, directory: str, max_bytes: int, shared: bool = False):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.shared    = shared
+        self.enabled   = bool(directory) and max_bytes > 0
+        self._lock     = threading.Lock()
+        self._entries: OrderedDict[str, int] = OrderedDict()  # filename -> bytes, LRU first
+        self._bytes    = 0
+        self._created  = time.time()
+        if self.enabled:
+            try:
+                os.makedirs(directory, exist_ok=True)
+            except OSError as e:
+                cache_log.warning("Disabled, cannot use %s: %s", directory, e)
+                self.enabled = False
+
+    def load(self):
+        """
+        Index the files already on disk. Runs in a worker thread at startup;
+        until it finishes, lookup() still finds files by checking the disk.
+        """
+        if not self.enabled:
+            return
+        files = self._scan(remove_stale_parts=True)
+        if files is None:
+            return
+        with self._lock:
+            recent, self._entries = self._entries, OrderedDict((name, size) for _, name, size in sorted(files))
+            for name, size in recent.items():  # Used since startup: most recent
+                self._entries.pop(name, None)
+                self._entries[name] = size
+            self._bytes = sum(self._entries.values())
+            self._evict_locked()
+        cache_log.info("%d cached tracks, %d MiB", len(self._entries), self._bytes // (1024 * 1024))
+
+    def _scan(self, remove_stale_parts: bool = False) -> list[tuple[float, str, int]] | None:
+        """(mtime, filename, bytes) of every cached track, oldest first."""
+        files = []
+        try:
+            for entry in os.scandir(self.directory):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue  # Evicted by another process meanwhile
+                if entry.name.endswith(".part"):
+                    if remove_stale_parts and stat.st_mtime < self._created:
+                        os.remove(entry.path)  # Left over from an interrupted write
+                elif entry.name.endswith(".opus"):
+                    files.append((stat.st_mtime, entry.name, stat.st_size))
+        except OSError as e:
+            cache_log.warning("Cannot index %s: %s", self.directory, e)
+            return None
+        return sorted(files)
+
+    @staticmethod
+    def _filename(video_id: str) -> str:
+        return hashlib.sha1(video_id.encode()).hexdigest() + ".opus"
+
+    def lookup(self, video_id: str) -> str | None:
+        if not self.enabled:
+            return None
+        name = self._filename(video_id)
+        path = os.path.join(self.directory, name)
+        with self._lock:
+            known = name in self._entries
+            if known:
+                self._entries.move_to_end(name)
+        if not known:
+            # Another shard process may have stored it
+            try:
+                size = os.path.getsize(path)
+            except OSError:
+                return None
+            with self._lock:
+                if name not in self._entries:
+                    self._entries[name] = size
+                    self._bytes += size
+        try:
+            os.utime(path)  # Keep LRU order across restarts
+        except OSError:
+            with self._lock:
+                self._bytes -= self._entries.pop(name, 0)
+            return None
+        return path
+
+    def part_path(self, video_id: str) -> str:
+        name = f"{self._filename(video_id)}.{os.getpid()}.{uuid.uuid4().hex[:8]}.part"
+        return os.path.join(self.directory, name)
+
+    def commit(self, video_id: str, part_path: str):
+        try:
+            size = os.path.getsize(part_path)
+            if size == 0 or size > self.max_bytes:
+                os.remove(part_path)
+                return
+            name = self._filename(video_id)
+            os.replace(part_path, os.path.join(self.directory, name))
+        except OSError as e:
+            cache_log.warning("Commit failed for video=%s: %s", video_id, e)
+            return
+        files = self._scan() if self.shared else None
+        with self._lock:
+            if files is not None:
+                # Files other processes stored or evicted count too
+                self._entries = OrderedDict((n, sz) for _, n, sz in files if n != name)
+                self._bytes   = sum(self._entries.values())
+            self._bytes -= self._entries.pop(name, 0)
+            self._entries[name] = size
+            self._bytes += size
+            self._evict_locked()
+        cache_log.info("Stored video=%s (%d KiB)", video_id, size // 1024)
+
+    def _evict_locked(self):
+        while self._bytes > self.max_bytes and self._entries:
+            name, size = self._entries.popitem(last=False)
+            self._bytes -= size
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+
+audio_cache = AudioCache(BOT_AUDIO_CACHE_DIR, BOT_AUDIO_CACHE_BYTES, shared=bool(BOT_SUPERVISOR_URL))
+
+# ── Queue model ────────────────────────────────────────────────────────────────
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+class Track:
+    """
+    Compact TrackObject. Rooms can queue thousands of tracks and every guild
+    in the room holds its own copy, so entries are slotted and their strings
+    interned (a title queued in many guilds is stored once). get() and []
+    take the backend's camelCase keys, like the dicts they replace.
+    """
+    __slots__ = ("video_id", "title", "artist", "album", "duration_ms", "thumbnail_url", "is_explicit")
+    _KEYS = {
+        "videoId": "video_id", "title": "title", "artist": "artist", "album": "album",
+        "durationMs": "duration_ms", "thumbnailUrl": "thumbnail_url", "isExplicit": "is_explicit",
+    }
+
+    def __init__(self, data: dict):
+        self.video_id      = _intern(data.get("videoId"))
+        self.title         = _intern(data.get("title"))
+        self.artist        = _intern(data.get("artist"))
+        self.album         = _intern(data.get("album"))
+        self.duration_ms   = data.get("durationMs")
+        self.thumbnail_url = data.get("thumbnailUrl")
+        self.is_explicit   = bool(data.get("isExplicit"))
+
+    @classmethod
+    def of(cls, track) -> "Track":
+        return track if isinstance(track, cls) else cls(track)
+
+    def get(self, key: str, default=None):
+        attr  = self._KEYS.get(key)
+        value = getattr(self, attr) if attr else None
+        return default if value is None else value
+
+    def __getitem__(self, key: str):
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def to_dict(self) -> dict:
+        return {key: getattr(self, attr) for key, attr in self._KEYS.items()}
+
+class TrackQueue:
+    """
+    A room queue (or autoplay queue) of Tracks. Backends with the queue_diff
+    feature send versioned ops against the previous queue instead of the
+    full list; apply() performs them in place and returns False when an op
+    does not fit, meaning the queue is out of sync and needs a full copy.
+    """
+    __slots__ = ("items", "revision")
+
+    def __init__(self, items=()):
+        self.items    = [Track.of(t) for t in items]
+        self.revision = 0  # Bumped on every in-place change
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __getitem__(self, index):
+        return self.items[index]
+
+    def apply(self, ops: list[dict]) -> bool:
+        items = self.items
+        self.revision += 1
+        for op in ops:
+            kind = op.get("op")
+            if kind == "move":
+                src, dst = op.get("from"), op.get("to")
+                if not (isinstance(src, int) and isinstance(dst, int) and 0 <= src < len(items) and 0 <= dst < len(items)):
+                    return False
+                items.insert(dst, items.pop(src))
+            elif kind == "splice":
+                index, remove = op.get("index"), op.get("remove", 0)
+                if not (isinstance(index, int) and 0 <= index <= len(items) and 0 <= remove <= len(items) - index):
+                    return False
+                items[index:index + remove] = [Track(t) for t in op.get("items") or []]
+            else:
+                return False
+        return True
+
+def _adopt_playback(state: "GuildState", playback: dict):
+    """
+    Store a PlaybackState payload with its queues as TrackQueues. queue_diff
+    backends leave the queues out of playback events, so missing queues are
+    carried over from the playback we already have.
+    """
+    previous = state.playback or {}
+    # The same decoded event reaches every guild in a room; each keeps its own copy
+    playback = dict(playback)
+    for key in ("queue", "autoplayQueue"):
+        if key in playback:
+            playback[key] = TrackQueue(playback[key] or [])
+        else:
+            playback[key] = previous.get(key) or TrackQueue()
+    state.playback = playback
+
 # ── Per-guild state ────────────────────────────────────────────────────────────
+class PlaybackActor:
+    """
+    Runs a guild's playback commands (track starts, seeks) one at a time.
+    The mailbox holds only the latest command: submitting replaces one that
+    has not started and cancels the one in flight, so a burst of now_playing
+    and seek events resolves and starts a decoder only for the last target.
+    """
+    def __init__(self, state: "GuildState"):
+        self.state    = state
+        self.video_id: str | None = None  # Track of the latest command
+        self._pending: tuple | None = None
+        self._current: asyncio.Task | None = None
+        self._task: asyncio.Task | None = None
+
+    @property
+    def busy(self) -> bool:
+        return self._pending is not None or (self._current is not None and not self._current.done())
+
+    def targets(self, video_id: str) -> bool:
+        """Whether a pending or running command is already bringing up video_id."""
+        return self.busy and self.video_id == video_id
+
+    def submit(self, video_id: str | None, fn, *args):
+        self.video_id = video_id
+        self._pending = (fn, args)
+        if self._current is not None and not self._current.done():
+            self._current.cancel()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while self._pending is not None:
+            fn, args = self._pending
+            self._pending = None
+            self._current = asyncio.create_task(fn(self.state, *args))
+            # wait() rather than await: a superseded command's cancellation must not stop the actor
+            await asyncio.wait((self._current,))
+            if not self._current.cancelled() and self._current.exception():
+                audio_log.error(
+                    "Playback command failed", exc_info=self._current.exception(), extra=_ctx(self.state)
+                )
+
+    def cancel(self):
+        self._pending = None
+        self.video_id = None
+        for task in (self._current, self._task):
+            if task and not task.done():
+                task.cancel()
+
 class GuildState:
     def __init__(self, guild_id: int):
         self.guild_id          = guild_id
@@ -128,26 +954,47 @@ class GuildState:
         self.room_id: str | None = None
         self.playback: dict | None = None
         self.ws: aiohttp.ClientWebSocketResponse | None = None
-        self.ws_task: asyncio.Task | None = None
         self.voice_client: discord.VoiceClient | None = None
         self.voice_channel_id: int | None = None
         self.text_channel_id: int | None = None
         self.last_track_id: str | None = None
         self.last_is_playing: bool | None = None
-        self.session: aiohttp.ClientSession | None = None
+        self.is_host: bool = False
+        self.audio: "GaplessSource | None" = None
+        self.clock_task: asyncio.Task | None = None
+        self.player            = PlaybackActor(self)
+        self.resolved          = ResolveCache(BOT_RESOLVE_TTL_SEC)
+        self.prefetch_task: asyncio.Task | None = None
+        self.now_playing_at: float | None = None  # When the last now_playing arrived
+        self.queue_version: int | None = None   # None until a full queue is known
+        self.suspended         = False  # Decoder stopped while nobody is listening
+        self.idle_since: float | None = None
+        self.last_used         = time.monotonic()
         self._now_playing: dict | None = None
         self._controls: "PlaybackControls | None" = None
 
     def reset(self):
+        for task in (self.prefetch_task, self.clock_task):
+            if task and not task.done():
+                task.cancel()
+        self.player.cancel()
+        self.resolved.clear()
+        self.now_playing_at    = None
+        self.queue_version     = None
+        self.suspended         = False
+        self.idle_since        = None
         self.room_code         = None
         self.room_id           = None
         self.playback          = None
         self.ws                = None
-        self.ws_task           = None
         self.voice_client      = None
         self.voice_channel_id  = None
         self.last_track_id     = None
         self.last_is_playing   = None
+        self.is_host           = False
+        self.audio             = None
+        self.clock_task        = None
+        self.prefetch_task     = None
         self._now_playing      = None
         self._controls         = None
 
@@ -156,7 +1003,9 @@ _guild_states: dict[int, GuildState] = {}
 def get_guild_state(guild_id: int) -> GuildState:
     if guild_id not in _guild_states:
         _guild_states[guild_id] = GuildState(guild_id)
-    return _guild_states[guild_id]
+    state = _guild_states[guild_id]
+    state.last_used = time.monotonic()
+    return state
 
 # ── Bot setup ──────────────────────────────────────────────────────────────────
 intents = discord.Intents.default()
@@ -164,31 +1013,92 @@ intents.voice_states = True
 intents.guilds = True
 intents.members = True  # needed to resolve voice state from interaction.user
 
-class SpotiSyncBot(discord.Client):
+# Shard processes run an AutoShardedClient over the shard IDs they were given
+_ClientBase = discord.AutoShardedClient if BOT_SHARD_IDS else discord.Client
+
+class SpotiSyncBot(_ClientBase):
     def __init__(self):
-        super().__init__(intents=intents)
+        if BOT_SHARD_IDS:
+            super().__init__(intents=intents, shard_ids=BOT_SHARD_IDS, shard_count=BOT_SHARD_COUNT)
+        else:
+            super().__init__(intents=intents)
         self.tree = app_commands.CommandTree(self)
-        self._session: aiohttp.ClientSession | None = None
+        self._metrics_runner: "web.AppRunner | None" = None
+        self._resumed = False
+        self._idle_task: asyncio.Task | None = None
 
     @property
     def session(self) -> aiohttp.ClientSession:
-        if self._session is None or self._session.closed:
-            self._session = aiohttp.ClientSession()
-        return self._session
+        return backend.session
+
+    async def close(self):
+        await sessions.flush()
+        await super().close()
+        if self._metrics_runner:
+            await self._metrics_runner.cleanup()
+        await backend.close()
+
+    async def before_identify_hook(self, shard_id: int | None, *, initial: bool = False):
+        if BOT_SUPERVISOR_URL:
+            # Identifies are rate limited per bot, not per process
+            await _supervisor_call("/identify", {"shard": shard_id}, timeout=None)
+        else:
+            await super().before_identify_hook(shard_id, initial=initial)
 
     async def setup_hook(self):
-        if DISCORD_GUILD_ID:
-            guild = discord.Object(id=int(DISCORD_GUILD_ID))
+        # Index the audio cache off the event loop; lookups work meanwhile
+        asyncio.get_running_loop().run_in_executor(None, audio_cache.load)
+        _check_state_dir()
+        if BOT_METRICS_PORT:
+            self._metrics_runner = await _start_metrics_server()
+        self._idle_task = asyncio.create_task(_idle_loop())
+        if BOT_SHARD_IDS and 0 not in BOT_SHARD_IDS:
+            return  # Commands are global; the process holding shard 0 syncs them
+        guild = discord.Object(id=int(DISCORD_GUILD_ID)) if DISCORD_GUILD_ID else None
+        if guild:
             self.tree.copy_global_to(guild=guild)
+        digest = self._command_hash(guild)
+        if BOT_SYNC_COMMANDS == "never" or (BOT_SYNC_COMMANDS == "auto" and digest == _read_state("commands.sha256")):
+            bot_log.info("Commands unchanged, skipping sync")
+            return
+        if guild:
             await self.tree.sync(guild=guild)
             await self.tree.sync(guild=None)  # clears stale global commands
-            print("[Bot] Registered guild commands")
+            bot_log.info("Registered guild commands")
         else:
             await self.tree.sync()
-            print("[Bot] Registered global commands")
+            bot_log.info("Registered global commands")
+        _write_state("commands.sha256", digest)
+
+    def _command_hash(self, guild: discord.abc.Snowflake | None) -> str:
+        """Stable hash of everything setup_hook would upload, and where to."""
+        def payload(target):
+            return sorted((c.to_dict(self.tree) for c in self.tree.get_commands(guild=target)), key=lambda c: c["name"])
+        spec = {
+            "application": DISCORD_CLIENT_ID,
+            "guild":       DISCORD_GUILD_ID or None,
+            "global":      payload(None),
+            "guild_commands": payload(guild) if guild else None,
+        }
+        return hashlib.sha256(json.dumps(spec, sort_keys=True, default=str).encode()).hexdigest()
 
     async def on_ready(self):
-        print(f"[Bot] Logged in as {self.user}")
+        shards = f" (shards {BOT_SHARD_IDS} of {BOT_SHARD_COUNT})" if BOT_SHARD_IDS else ""
+        bot_log.info("Logged in as %s%s", self.user, shards)
+        if not self._resumed:  # on_ready also fires after gateway reconnects
+            self._resumed = True
+            asyncio.create_task(_resume_sessions())
+
+    async def on_voice_state_update(self, member: discord.Member, before: discord.VoiceState, after: discord.VoiceState):
+        state = _guild_states.get(member.guild.id)
+        if state is None or state.voice_client is None:
+            return
+        if member.id == self.user.id and after.channel and after.channel.id != state.voice_channel_id:
+            state.voice_channel_id = after.channel.id  # Moved by someone
+            sessions.save(state, urgent=True)
+        channels = {c.id for c in (before.channel, after.channel) if c}
+        if state.voice_channel_id in channels:
+            _update_idle(state)
         await self.change_presence(
             status=discord.Status.online,
             activity=discord.Game("Türkiye should make Istanbul Constantinople"),
@@ -198,12 +1108,28 @@ bot = SpotiSyncBot()
 
 # ── Playback controls UI ───────────────────────────────────────────────────────
 class PlaybackControls(View):
+    """
+    The /playback controller message. Updates from playback events and
+    buttons only mark it dirty (request_render); one render task merges
+    everything pending into a single edit per BOT_CONTROLS_EDIT_INTERVAL_MS
+    window, skips the edit when the message would not change, and backs off
+    for as long as Discord's 429 Retry-After asks. Queue pages are rendered
+    once per queue revision.
+    """
+    PAGE_SIZE = 10
+
     def __init__(self, state: GuildState):
         super().__init__(timeout=None)
         self.state = state
         self.message: discord.Message | None = None
         self.showing_queue = False
         self.page = 0
+        self._dirty        = False
+        self._render_task: asyncio.Task | None = None
+        self._next_edit_at = 0.0
+        self._rendered: tuple | None = None  # What the message currently shows
+        self._pages: dict[int, str] = {}
+        self._pages_key: tuple | None = None
 
     def _header(self) -> str:
         track       = self.state._now_playing
@@ -211,13 +1137,79 @@ class PlaybackControls(View):
         room_code   = self.state.room_code or "—"
         return f"🎵 **Now Playing:** {now_playing}\n🔑 **Room Code:** `{room_code}`"
 
-    async def update_display(self):
-        if not self.message:
-            return
-        try:
-            await self.message.edit(content=self._header(), view=self)
-        except Exception:
-            pass
+    def _queue_page(self, queue) -> str:
+        # TrackQueue revisions change on every in-place diff; a replaced queue
+        # is a different object, so either invalidates the cached pages.
+        key = (queue, getattr(queue, "revision", None))
+        if key != self._pages_key:
+            self._pages, self._pages_key = {}, key
+        max_page  = (len(queue) - 1) // self.PAGE_SIZE
+        self.page = max(0, min(self.page, max_page))
+        page = self._pages.get(self.page)
+        if page is None:
+            start = self.page * self.PAGE_SIZE
+            lines = "\n".join(
+                f"{start + i + 1}. {t.get('title', 'Unknown')} — {t.get('artist', 'Unknown')}"
+                for i, t in enumerate(queue[start:start + self.PAGE_SIZE])
+            )
+            page = self._pages[self.page] = f"📃 **Queue Page {self.page + 1}/{max_page + 1}**\n{lines}"
+        return page
+
+    def _render(self) -> str:
+        if not self.showing_queue:
+            return self._header()
+        queue = (self.state.playback or {}).get("queue") or []
+        if not queue:
+            self.showing_queue = False
+            return self._header() + "\n\n🪹 Queue is empty."
+        return self._header() + "\n\n" + self._queue_page(queue)
+
+    def _fingerprint(self, content: str) -> tuple:
+        return (content, tuple(getattr(item, "label", None) for item in self.children))
+
+    def request_render(self):
+        """Schedule an edit with the current state; cheap to call on every change."""
+        self._dirty = True
+        if self.message and (self._render_task is None or self._render_task.done()):
+            self._render_task = asyncio.create_task(self._render_loop())
+
+    async def _render_loop(self):
+        while self._dirty and self.message:
+            delay = self._next_edit_at - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)  # Changes arriving meanwhile join this edit
+            self._dirty = False
+            content     = self._render()
+            fingerprint = self._fingerprint(content)
+            if fingerprint == self._rendered:
+                continue
+            try:
+                await self.message.edit(content=content, view=self)
+            except discord.RateLimited as e:
+                self._retry_after(e.retry_after)
+                continue
+            except discord.NotFound:
+                self.message = None  # Deleted, or the interaction token expired
+                return
+            except discord.HTTPException as e:
+                if e.status == 429:
+                    self._retry_after(float(e.response.headers.get("Retry-After", 1)))
+                else:
+                    controls_log.warning("Edit failed (%s): %s", e.status, e.text, extra=_ctx(self.state))
+                continue
+            self._rendered     = fingerprint
+            self._next_edit_at = time.monotonic() + BOT_CONTROLS_EDIT_INTERVAL_MS / 1000
+
+    def _retry_after(self, seconds: float):
+        controls_log.warning("Rate limited, retrying in %.1fs", seconds, extra=_ctx(self.state))
+        self._dirty        = True
+        self._next_edit_at = time.monotonic() + seconds
+
+    async def _respond(self, interaction: discord.Interaction):
+        """Render in the button's own interaction response (not channel-rate-limited)."""
+        content = self._render()
+        await interaction.response.edit_message(content=content, view=self)
+        self._rendered = self._fingerprint(content)
 
     @discord.ui.button(label="⏸ Pause", style=discord.ButtonStyle.primary)
     async def pause(self, interaction: discord.Interaction, button: Button):
@@ -230,8 +1222,7 @@ class PlaybackControls(View):
             vc.resume()
             button.label = "⏸ Pause"
             asyncio.create_task(_ws_send(self.state, "playback_state", {"isPlaying": True}))
-        await self.update_display()
-        await interaction.response.defer()
+        await self._respond(interaction)
 
     @discord.ui.button(label="⏭ Skip", style=discord.ButtonStyle.secondary)
     async def skip(self, interaction: discord.Interaction, button: Button):
@@ -246,13 +1237,13 @@ class PlaybackControls(View):
             await interaction.response.send_message("⏭ Skipped.", ephemeral=True)
         else:
             await interaction.response.send_message("Nothing to skip.", ephemeral=True)
-        await self.update_display()
+        self.request_render()
 
     @discord.ui.button(label="📃 Queue", style=discord.ButtonStyle.secondary)
     async def show_queue(self, interaction: discord.Interaction, button: Button):
         self.showing_queue = True
         self.page = 0
-        await self._render_queue(interaction)
+        await self._respond(interaction)
 
     @discord.ui.button(label="⬅️ Prev", style=discord.ButtonStyle.secondary)
     async def prev_page(self, interaction: discord.Interaction, button: Button):
@@ -260,7 +1251,7 @@ class PlaybackControls(View):
             await interaction.response.defer()
             return
         self.page = max(0, self.page - 1)
-        await self._render_queue(interaction)
+        await self._respond(interaction)
 
     @discord.ui.button(label="➡️ Next", style=discord.ButtonStyle.secondary)
     async def next_page(self, interaction: discord.Interaction, button: Button):
@@ -268,76 +1259,332 @@ class PlaybackControls(View):
             await interaction.response.defer()
             return
         self.page += 1
-        await self._render_queue(interaction)
+        await self._respond(interaction)
 
-    async def _render_queue(self, interaction: discord.Interaction):
-        playback   = self.state.playback or {}
-        full_queue = playback.get("queue", [])
-        if not full_queue:
-            self.showing_queue = False
-            await interaction.response.edit_message(
-                content=self._header() + "\n\n🪹 Queue is empty.", view=self
+# ── WebSocket ──────────────────────────────────────────────────────────────────
+def _reconnect_delay(attempt: int) -> float:
+    """Capped exponential backoff with full jitter, so sockets dropped by the
+    same backend restart do not all reconnect in the same instant."""
+    ceiling = min(BOT_WS_BACKOFF_MAX_MS, BOT_WS_BACKOFF_BASE_MS * 2 ** (attempt - 1))
+    return random.uniform(BOT_WS_BACKOFF_BASE_MS / 2, max(ceiling, BOT_WS_BACKOFF_BASE_MS)) / 1000
+
+class BackendSocket:
+    """
+    One authenticated backend socket carrying one or more rooms. Per
+    STANDARDS.md: ws[s]://<backend-host>/ws?token=<JWT>
+    The backend ignores the query-string token for WS auth — it always requires
+    an explicit { event: "auth", data: { token } } message after auth_required.
+    When the backend advertises the "room_mux" feature on "connected", every
+    room is joined over this socket with messages tagged by room code (see
+    API_STANDARDS.md); otherwise the socket carries a single room untagged.
+    Auth asks for MessagePack frames and permessage-deflate; a backend without
+    them keeps sending JSON text, and both frame types are decoded.
+    Reconnects automatically while it still has rooms, and rejoins all of them.
+    """
+    def __init__(self, manager: "WSConnectionManager"):
+        self.manager = manager
+        self.ws: aiohttp.ClientWebSocketResponse | None = None
+        self.task: asyncio.Task | None = None
+        self.rooms: dict[str, set[GuildState]] = {}
+        self.mux   = False
+        self.queue_diff = False
+        self.queue_batch = False
+        self.ready = False  # authenticated; joins can be sent
+        self.failures = 0   # consecutive connects that never authenticated
+
+    def _bind(self, ws: aiohttp.ClientWebSocketResponse | None):
+        self.ws = ws
+        if ws is None:
+            self.ready = False
+        for states in self.rooms.values():
+            for state in states:
+                state.ws = ws
+
+    async def send(self, room_code: str | None, event: str, data: dict):
+        if self.ws is None:
+            return
+        msg = {"event": event, "data": data}
+        if self.mux and room_code:
+            msg["room"] = room_code
+        await self.ws.send_json(msg)
+
+    async def join(self, room_code: str):
+        if self.ready:
+            data = {"code": room_code}
+            if self.queue_diff:
+                data["features"] = ["queue_diff"]
+            await self.send(room_code, "join_room", data)
+
+    async def _dispatch(self, msg: dict):
+        event = msg.get("event")
+        data  = msg.get("data") or {}
+
+        if event == "auth_required":
+            await self.send(None, "auth", {
+                "token":    backend.token,
+                "encoding": "msgpack" if BOT_WS_BINARY else "json",
+                "compress": BOT_WS_COMPRESS,
+            })
+            return
+
+        if event == "connected" and "room" not in msg:
+            features   = data.get("features") or []
+            self.mux   = "room_mux" in features
+            self.queue_diff = "queue_diff" in features
+            self.queue_batch = "queue_batch" in features
+            self.ready = True
+            self.failures = 0
+            self.manager._negotiated(self)
+            ws_log.info(
+                "Authenticated (mux=%s, encoding=%s, compress=%s), joining %d room(s)",
+                self.mux, data.get("encoding", "json"), data.get("compress", False), len(self.rooms),
             )
+            for room_code in list(self.rooms):
+                await self.join(room_code)
             return
-        page_size = 10
-        max_page  = (len(full_queue) - 1) // page_size
-        self.page = max(0, min(self.page, max_page))
-        start     = self.page * page_size
-        items     = full_queue[start:start + page_size]
-        lines     = "\n".join(
-            f"{start + i + 1}. {t.get('title', 'Unknown')} — {t.get('artist', 'Unknown')}"
-            for i, t in enumerate(items)
-        )
-        content = (
-            self._header()
-            + f"\n\n📃 **Queue Page {self.page + 1}/{max_page + 1}**\n{lines}"
-        )
-        await interaction.response.edit_message(content=content, view=self)
 
-# ── WebSocket ──────────────────────────────────────────────────────────────────
+        room_code = msg.get("room") if self.mux else next(iter(self.rooms), None)
+        states = self.rooms.get(room_code) if room_code else None
+        if not states:
+            if event == "error":
+                ws_log.warning("Backend error: %s", data.get("message", "unknown error"))
+            return
+        for state in list(states):
+            # Tasks spawned while handling inherit the context, so their logs carry it too
+            context = _log_context.set({"guild": state.guild_id, "room": state.room_code})
+            try:
+                with WS_EVENT_SECONDS.time(event=event):
+                    await _handle_ws_message(state, msg)
+            finally:
+                _log_context.reset(context)
+
+    async def run(self):
+        while self.rooms:
+            try:
+                token  = await backend.get_token()
+                ws_url = f"{BACKEND_WS_URL}?token={token}"
+                ws_log.info("Connecting to backend")
+                # compress=15 offers permessage-deflate in the handshake
+                async with backend.session.ws_connect(ws_url, compress=15 if BOT_WS_COMPRESS else 0) as ws:
+                    self._bind(ws)
+                    ws_log.info("Connected")
+                    async for msg in ws:
+                        if msg.type in (aiohttp.WSMsgType.BINARY, aiohttp.WSMsgType.TEXT):
+                            try:
+                                if msg.type == aiohttp.WSMsgType.BINARY:
+                                    import msgpack  # Only once the backend sends binary frames
+                                    payload = msgpack.unpackb(msg.data)
+                                else:
+                                    payload = json.loads(msg.data)
+                                await self._dispatch(payload)
+                            except Exception as e:
+                                ws_log.error("Message error: %s", e, exc_info=True)
+                        elif msg.type in (aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR):
+                            ws_log.warning("Closed (%s)", msg.type)
+                            break
+            except asyncio.CancelledError:
+                ws_log.info("Task cancelled")
+                self._bind(None)
+                return
+            except Exception as e:
+                ws_log.warning("Connection error: %s", e)
+
+            self._bind(None)
+            if not self.rooms:
+                break  # Every room left intentionally — do not reconnect
+            self.failures += 1
+            WS_RECONNECTS.inc()
+            delay = _reconnect_delay(self.failures)
+            ws_log.info("Reconnecting in %.1fs (attempt %d)", delay, self.failures)
+            await asyncio.sleep(delay)
+        self.manager._discard(self)
+
+    def close(self):
+        if self.task is None or self.task.done():
+            return
+        if self.task is asyncio.current_task():
+            # Closing from inside our own dispatch (e.g. room_closed): let the
+            # read loop end instead of cancelling the running handler.
+            if self.ws is not None:
+                asyncio.create_task(self.ws.close())
+        else:
+            self.task.cancel()
+
+class WSConnectionManager:
+    """
+    Keeps a small pool of backend sockets (BOT_WS_POOL_SIZE, default 1) and
+    places each room on one of them. Guilds that join the same room share that
+    room's subscription, and incoming events are routed to every GuildState
+    subscribed to the event's room. Backends without room_mux fall back to
+    one socket per room.
+    """
+    def __init__(self, pool_size: int):
+        self.pool_size = max(1, pool_size)
+        self.sockets: list[BackendSocket] = []
+        self.mux_supported: bool | None = None  # Unknown until first "connected"
+        self._placement: dict[int, tuple[BackendSocket, str]] = {}
+
+    def _new_socket(self) -> BackendSocket:
+        sock = BackendSocket(self)
+        self.sockets.append(sock)
+        return sock
+
+    def _socket_for_room(self, room_code: str) -> BackendSocket | None:
+        for sock in self.sockets:
+            if room_code in sock.rooms:
+                return sock
+        return None
+
+    def socket_for(self, state: GuildState) -> BackendSocket | None:
+        placed = self._placement.get(state.guild_id)
+        return placed[0] if placed else None
+
+    def _place(self) -> BackendSocket:
+        if self.mux_supported is False:
+            return self._new_socket()
+        if len(self.sockets) < self.pool_size:
+            return self._new_socket()
+        return min(self.sockets, key=lambda sock: len(sock.rooms))
+
+    def _start(self, sock: BackendSocket):
+        if sock.task is None or sock.task.done():
+            sock.task = asyncio.create_task(sock.run())
+
+    def _discard(self, sock: BackendSocket):
+        if sock in self.sockets and not sock.rooms:
+            self.sockets.remove(sock)
+
+    def _negotiated(self, sock: BackendSocket):
+        self.mux_supported = sock.mux
+        if sock.mux or len(sock.rooms) <= 1:
+            return
+        # The backend binds a plain socket to one room; move the rest out.
+        for room_code in list(sock.rooms)[1:]:
+            states = sock.rooms.pop(room_code)
+            target = self._new_socket()
+            target.rooms[room_code] = states
+            for state in states:
+                state.ws = None
+                self._placement[state.guild_id] = (target, room_code)
+            self._start(target)
+
+    async def subscribe(self, state: GuildState, room_code: str):
+        sock = self._socket_for_room(room_code) or self._place()
+        sock.rooms.setdefault(room_code, set()).add(state)
+        self._placement[state.guild_id] = (sock, room_code)
+        state.ws = sock.ws
+        if sock.task is None or sock.task.done():
+            self._start(sock)
+        else:
+            # Also sent when another guild already joined this room, so the
+            # new guild gets its own room_state. No-op until authenticated.
+            await sock.join(room_code)
+
+    async def unsubscribe(self, state: GuildState):
+        placed = self._placement.pop(state.guild_id, None)
+        state.ws = None
+        if not placed:
+            return
+        sock, room_code = placed
+        states = sock.rooms.get(room_code)
+        if states is None:
+            return
+        states.discard(state)
+        if states:
+            return
+        del sock.rooms[room_code]
+        if sock.rooms:
+            try:
+                await sock.send(room_code, "leave_room", {})
+            except Exception as e:
+                ws_log.warning("Leave error (%s): %s", room_code, e)
+        else:
+            sock.close()
+            self._discard(sock)
+
+    async def send(self, state: GuildState, event: str, data: dict):
+        placed = self._placement.get(state.guild_id)
+        if not placed:
+            return
+        sock, room_code = placed
+        await sock.send(room_code, event, data)
+
+ws_manager = WSConnectionManager(BOT_WS_POOL_SIZE)
+
 async def _ws_send(state: GuildState, event: str, data: dict):
     if state.ws is None:
         return
     try:
-        await state.ws.send_json({"event": event, "data": data})
+        await ws_manager.send(state, event, data)
     except Exception as e:
-        print(f"[WS] Send error ({event}): {e}")
+        ws_log.warning("Send error (%s): %s", event, e, extra=_ctx(state))
 
 async def _handle_ws_message(state: GuildState, msg: dict):
     event = msg.get("event")
     data  = msg.get("data") or {}
 
-    if event == "auth_required":
-        # The backend sends this immediately on connection and will not process
-        # any other messages until it receives a valid auth response.
-        # The query-string token is ignored by the backend WS handler — it
-        # always requires this explicit auth message.
-        await _ws_send(state, "auth", {"token": _backend_token})
-        return
-
-    if event == "connected":
-        await _ws_send(state, "join_room", {"code": state.room_code})
-
-    elif event == "room_state":
-        state.playback = data.get("playback")
-        _sync_playback(state)
+    if event == "room_state":
+        previous       = state.playback
+        state.is_host  = bool(data.get("isHost"))
+        state.playback = None
+        if data.get("playback"):
+            _adopt_playback(state, data["playback"])
+        state.queue_version = data.get("queueVersion")
+        _index_playback(state.playback)
+        if previous is not None and state.last_track_id:
+            _resync_playback(state, previous)  # Rejoin after a reconnect
+        else:
+            _sync_playback(state)
 
     elif event in ("now_playing", "playback_state"):
-        state.playback = data or state.playback
+        if data:
+            _adopt_playback(state, data)
+        if event == "now_playing":
+            state.now_playing_at = time.perf_counter()
+            _index_playback(state.playback)
         _sync_playback(state)
 
     elif event == "playback_seek":
-        state.playback = data or state.playback
-        if state.playback and state.playback.get("currentItem"):
-            asyncio.create_task(
-                _play_track(state, state.playback["currentItem"], state.playback.get("positionMs", 0))
-            )
+        if data:
+            _adopt_playback(state, data)
+        if state.playback and state.playback.get("currentItem") and not state.suspended:
+            # Scrubbing sends bursts; each one supersedes the last, so only
+            # the final position survives the debounce.
+            state.player.submit(state.playback["currentItem"].get("videoId"), _debounced_seek)
+        _schedule_prefetch(state)
 
     elif event == "queue_updated":
         if state.playback is None:
             state.playback = {}
-        state.playback["queue"]         = data.get("queue", [])
-        state.playback["autoplayQueue"] = data.get("autoplayQueue", [])
+        state.playback["queue"]         = TrackQueue(data.get("queue") or [])
+        state.playback["autoplayQueue"] = TrackQueue(data.get("autoplayQueue") or [])
+        state.queue_version = data.get("version")
+        _index_playback(state.playback)
+        _schedule_prefetch(state)
+        if state._controls:
+            state._controls.request_render()
+
+    elif event == "queue_diff":
+        playback = state.playback
+        if state.queue_version is None or playback is None:
+            return  # Waiting for room_state or the queue_sync reply
+        in_sync = (
+            data.get("baseVersion") == state.queue_version
+            and playback["queue"].apply(data.get("queue") or [])
+            and playback["autoplayQueue"].apply(data.get("autoplayQueue") or [])
+        )
+        if not in_sync:
+            ws_log.info("Queue out of sync at version %s, requesting a full copy", state.queue_version)
+            state.queue_version = None
+            await _ws_send(state, "queue_sync", {})
+            return
+        state.queue_version = data.get("version")
+        for key in ("queue", "autoplayQueue"):
+            for op in data.get(key) or []:
+                track_index.add_many(op.get("items") or [])
+        _schedule_prefetch(state)
+        if state._controls:
+            state._controls.request_render()
 
     elif event == "room_closed":
         await _send_channel_message(state, f"Room closed: {data.get('reason', 'unknown reason')}")
@@ -346,107 +1593,663 @@ async def _handle_ws_message(state: GuildState, msg: dict):
     elif event == "error":
         await _send_channel_message(state, f"Backend error: {data.get('message', 'unknown error')}")
 
-async def _run_ws(state: GuildState):
+async def _connect_room(state: GuildState, room_code: str):
+    await ws_manager.unsubscribe(state)
+    state.room_code = room_code
+    sessions.save(state, urgent=True)
+    await ws_manager.subscribe(state, room_code)
+
+# ── Audio playback ─────────────────────────────────────────────────────────────
+# 20 ms per frame sent to Discord. Opus packets are counted as one frame each,
+# which holds for FFmpeg's libopus output and YouTube's Opus streams.
+FRAME_MS = discord.opus.Encoder.FRAME_LENGTH
+# Guilds in one room share a decoder. Listeners may drift apart by up to
+# FANOUT_BUFFER_FRAMES; one that has not read for FANOUT_REJOIN_SEC
+# (paused) rejoins live. Seeks this close to a shared decoder's position are
+# taken as already done by another guild in the room.
+FANOUT_BUFFER_FRAMES      = 25
+FANOUT_REJOIN_SEC         = 0.2
+FANOUT_SEEK_TOLERANCE_MS  = 250
+# Time one read() may spend draining the decoder towards a forward seek.
+SEEK_DRAIN_BUDGET_SEC     = 0.01
+
+class GaplessSource(discord.AudioSource):
     """
-    WebSocket loop. Per STANDARDS.md:
-      ws[s]://<backend-host>/ws?token=<JWT>
-    The backend ignores the query-string token for WS auth — it always requires
-    an explicit { event: "auth", data: { token } } message, which is handled in
-    _handle_ws_message via the auth_required event.
-    Reconnects automatically unless room_code is cleared (intentional leave).
+    Long-lived AudioSource that stays attached to the VoiceClient across track
+    changes. The next track's decoder is started ahead of time (prepare_next)
+    and swapped in inside read() on the frame after the current one runs dry,
+    so a track change never stops the player or waits for FFmpeg to probe.
+
+    It also serves as the guild's playback clock: position_ms counts the
+    20 ms frames actually handed to the VoiceClient since the decoder started,
+    so it stops while paused and reflects stalls, unlike the room timeline.
+
+    Frames of the current track are kept in a bounded history
+    (BOT_SEEK_BUFFER_BYTES), so seek() can jump back into audio already
+    decoded, or a short way forward by draining the running decoder, without
+    starting a new FFmpeg process or resolving the track again.
+
+    VoiceClients never play it directly but through an AudioListener each
+    (listen()), so guilds in the same room share one decoder: the first
+    listener due for a frame reads it from the decoder and the others get the
+    same packet from a short buffer. A listener that stops reading (paused)
+    rejoins at the live frame. The decoders are cleaned up with the last
+    listener.
+
+    read() runs on discord.py's audio thread; everything else runs on the
+    event loop, so the swap is guarded by a lock and retired decoders are
+    cleaned up from the audio thread rather than blocking the loop.
     """
-    session = state.session or bot.session
-    while True:
-        try:
-            token  = await _get_backend_token(session)
-            ws_url = f"{BACKEND_WS_URL}?token={token}"
-            print("[WS] Connecting to backend")
-            async with session.ws_connect(ws_url) as ws:
-                state.ws = ws
-                print("[WS] Connected")
-                async for msg in ws:
-                    if msg.type == aiohttp.WSMsgType.TEXT:
-                        try:
-                            parsed = json.loads(msg.data)
-                            await _handle_ws_message(state, parsed)
-                        except Exception as e:
-                            print(f"[WS] Message error: {e}")
-                    elif msg.type in (aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR):
-                        print(f"[WS] Closed ({msg.type})")
-                        break
-        except asyncio.CancelledError:
-            print("[WS] Task cancelled")
-            return
-        except Exception as e:
-            print(f"[WS] Connection error: {e}")
+    def __init__(self, track: dict, source: discord.AudioSource, start_ms: int = 0, room: str | None = None):
+        self._lock    = threading.Lock()
+        self.track    = track
+        self.room     = room
+        self._source  = source
+        self.start_ms = start_ms
+        self.frames   = 0  # Index of the next frame to send, relative to start_ms
+        self._reset_history()
+        self._next: tuple[dict, discord.AudioSource] | None = None
+        self._retired: list[discord.AudioSource] = []
+        self.ended    = False  # True once the last track ran out naturally
+        self.closed   = False  # Last listener gone; decoders cleaned up
+        self._first_frame_t0: float | None = None
+        # Fan-out, guarded by _fan_lock (taken before _lock, never inside it)
+        self._fan_lock = threading.Lock()
+        self._fan: deque[bytes] = deque(maxlen=FANOUT_BUFFER_FRAMES)
+        self._fan_next = 0  # Index of the next frame to read from the decoder
+        self._listeners: list["AudioListener"] = []
+
+    def time_first_frame(self, t0: float):
+        """Report the time from t0 to the next frame sent as FIRST_AUDIO_SECONDS."""
+        self._first_frame_t0 = t0
 
-        state.ws = None
-        if not state.room_code:
-            return  # Intentional leave — do not reconnect
-        print("[WS] Reconnecting in 5s...")
-        await asyncio.sleep(5)
+    @property
+    def next_video_id(self) -> str | None:
+        with self._lock:
+            return self._next[0].get("videoId") if self._next else None
 
-async def _connect_room(state: GuildState, room_code: str):
-    if state.ws_task and not state.ws_task.done():
-        state.ws_task.cancel()
+    @property
+    def position_ms(self) -> int:
+        return self.start_ms + self.frames * FRAME_MS
+
+    @property
+    def shared(self) -> bool:
+        return len(self._listeners) > 1
+
+    def feeds(self, vc: discord.VoiceClient | None) -> bool:
+        return vc is not None and getattr(vc.source, "audio", None) is self
+
+    def playing(self, video_id: str, position_ms: int | None = None) -> bool:
+        """Whether it is live on video_id (near position_ms, if given)."""
+        if self.closed or self.ended or self.track.get("videoId") != video_id:
+            return False
+        return position_ms is None or abs(self.position_ms - position_ms) <= FANOUT_SEEK_TOLERANCE_MS
+
+    def listen(self, on_handoff=None) -> "AudioListener | None":
+        """A new AudioListener for one VoiceClient; None once closed."""
+        with self._fan_lock:
+            if self.closed:
+                return None
+            listener = AudioListener(self, on_handoff)
+            self._listeners.append(listener)
+            return listener
+
+    def _detach(self, listener: "AudioListener"):
+        with self._fan_lock:
+            if listener not in self._listeners:
+                return
+            self._listeners.remove(listener)
+            if self._listeners:
+                return
+            self.closed = True
+        self.cleanup()
+
+    def _fan_reset(self):
+        # Frames buffered before a jump must not reach a lagging listener
+        with self._fan_lock:
+            self._fan.clear()
+
+    def _read_for(self, listener: "AudioListener") -> bytes:
+        now = time.monotonic()
+        with self._fan_lock:
+            oldest = self._fan_next - len(self._fan)
+            if (
+                listener.cursor < oldest or listener.cursor > self._fan_next
+                or now - listener.last_read > FANOUT_REJOIN_SEC
+            ):
+                listener.cursor = self._fan_next  # New, lagging or resumed: go live
+            listener.last_read = now
+            if listener.cursor == self._fan_next:
+                data = self.read()
+                if not data:
+                    return b""
+                self._fan.append(data)
+                self._fan_next += 1
+            else:
+                data = self._fan[listener.cursor - oldest]
+            listener.cursor += 1
+            return data
+
+    def _reset_history(self):
+        self._history: deque[bytes] = deque()
+        self._history_bytes = 0
+        self._history_first = 0  # Frame index of _history[0]
+        self._decoded       = 0  # Frames read from the current decoder so far
+
+    def _remember(self, data: bytes):
+        self._history.append(data)
+        self._history_bytes += len(data)
+        self._decoded += 1
+        while self._history_bytes > BOT_SEEK_BUFFER_BYTES and len(self._history) > 1:
+            self._history_bytes -= len(self._history.popleft())
+            self._history_first += 1
+
+    def seek(self, position_ms: int) -> bool:
+        """Seek within the current decoder; False if a new decoder is needed."""
+        target = (position_ms - self.start_ms) // FRAME_MS
+        with self._lock:
+            if target < self._history_first:
+                return False
+            if (target - self._decoded) * FRAME_MS > BOT_SEEK_FORWARD_MAX_MS:
+                return False
+            # Past _decoded, read() fast-forwards through the decoder.
+            self.frames = target
+        self._fan_reset()
+        return True
+
+    def replace(self, track: dict, source: discord.AudioSource, start_ms: int = 0):
+        """Switch to another track immediately (at the next frame)."""
+        with self._lock:
+            self._retired.append(self._source)
+            self.track, self._source = track, source
+            self.start_ms, self.frames = start_ms, 0
+            self._reset_history()
+            self.ended = False
+            if self._next and self._next[0].get("videoId") == track.get("videoId"):
+                self._retired.append(self._next[1])
+                self._next = None
+        self._fan_reset()
+
+    def promote_next(self) -> bool:
+        """Switch to the prepared next track now, if there is one."""
+        with self._lock:
+            if not self._next:
+                return False
+            self._retired.append(self._source)
+            (self.track, self._source), self._next = self._next, None
+            self.start_ms, self.frames = 0, 0
+            self._reset_history()
+        self._fan_reset()
+        return True
+
+    def prepare_next(self, track: dict, source: discord.AudioSource):
+        source.startup = None  # Starts ahead of time; not on the path to first audio
+        with self._lock:
+            if self._next:
+                self._retired.append(self._next[1])
+            self._next = (track, source)
+
+    def drop_next(self):
+        with self._lock:
+            if self._next:
+                self._retired.append(self._next[1])
+                self._next = None
+
+    def _cleanup_retired(self):
+        with self._lock:
+            retired, self._retired = self._retired, []
+        for source in retired:
+            try:
+                source.cleanup()
+            except Exception as e:
+                audio_log.warning("Decoder cleanup failed: %s", e)
+
+    def _read_current(self) -> bytes:
+        with self._lock:
+            if self.frames < self._decoded:
+                # Replaying after a backward seek
+                data = self._history[self.frames - self._history_first]
+                self.frames += 1
+                return data
+            source = self._source
+        deadline = time.perf_counter() + SEEK_DRAIN_BUDGET_SEC
+        while True:
+            data = source.read()
+            startup = getattr(source, "startup", None)
+            if startup and data:
+                source.startup = None
+                FFMPEG_STARTUP_SECONDS.observe(time.perf_counter() - startup[1], profile=startup[0])
+            with self._lock:
+                if source is not self._source:
+                    return data  # Replaced mid-read; the next read picks it up
+                if not data:
+                    return b""
+                self._remember(data)
+                if self._decoded > self.frames:
+                    self.frames += 1
+                    return data
+            # Still fast-forwarding towards a seek target. Send silence once
+            # this read's budget is spent so a slow relay cannot stall the
+            # player (or, through the fan-out, other guilds' players).
+            if time.perf_counter() >= deadline:
+                return discord.opus.OPUS_SILENCE
+
+    def read(self) -> bytes:
+        if self._retired:
+            self._cleanup_retired()
+        data = self._read_current()
+        if data:
+            if self._first_frame_t0 is not None:
+                FIRST_AUDIO_SECONDS.observe(time.perf_counter() - self._first_frame_t0)
+                self._first_frame_t0 = None
+            return data
+        with self._lock:
+            if not self._next:
+                self.ended = True
+                return b""
+            prev = self.track
+            self._retired.append(self._source)
+            (self.track, self._source), self._next = self._next, None
+            self.start_ms, self.frames = 0, 0
+            self._reset_history()
+            nxt = self.track
+        data = self._read_current()
+        for listener in list(self._listeners):
+            if listener.on_handoff:
+                listener.on_handoff(prev, nxt)
+        return data
+
+    def is_opus(self) -> bool:
+        # Every decoder is an FFmpegOpusAudio (see _make_ffmpeg_source), so
+        # frames are Opus packets and skip discord.py's in-process encoder.
+        return True
+
+    def cleanup(self):
+        with self._lock:
+            self._retired.append(self._source)
+            if self._next:
+                self._retired.append(self._next[1])
+                self._next = None
+        self._cleanup_retired()
+
+class AudioListener(discord.AudioSource):
+    """One VoiceClient's reader of a GaplessSource; see GaplessSource.listen()."""
+    def __init__(self, audio: GaplessSource, on_handoff=None):
+        self.audio      = audio
+        self.on_handoff = on_handoff
+        self.cursor     = -1  # Next fan-out frame index; -1 until the first read
+        self.last_read  = 0.0
+
+    @property
+    def track(self) -> dict:
+        return self.audio.track
+
+    def read(self) -> bytes:
+        return self.audio._read_for(self)
+
+    def is_opus(self) -> bool:
+        return True
+
+    def cleanup(self):
+        self.audio._detach(self)
+
+def _is_opus_stream(content_type: str | None) -> bool:
+    """
+    Whether the stream already carries Opus, so it can be stream-copied. The
+    worker's ffmpeg mode serves audio/opus; otherwise a codecs parameter
+    decides. Without one, WebM counts as Opus (YouTube's audio-only WebM
+    formats are), but Ogg does not, since it may hold Vorbis.
+    """
+    if not content_type:
+        return False
+    mime, _, params = content_type.lower().partition(";")
+    mime = mime.strip()
+    if mime == "audio/opus":
+        return True
+    codecs = re.search(r"codecs\s*=\s*\"?([^\";]*)", params)
+    if codecs:
+        return codecs.group(1).strip() == "opus"
+    return mime == "audio/webm"
+
+class TeeOpusAudio(discord.FFmpegOpusAudio):
+    """
+    FFmpegOpusAudio that also writes the same Opus stream to an AudioCache
+    .part file through FFmpeg's tee muxer (one encode, two outputs). The
+    file is committed only if FFmpeg exits cleanly after the last packet;
+    a track that is skipped, seeked away from or killed leaves no entry.
+    """
+    def __init__(self, url: str, video_id: str, *, passthrough: bool, before_options: str = ""):
+        self._video_id  = video_id
+        self._part_path = audio_cache.part_path(video_id)
+        self._finishing = False
+        args = [
+            *shlex.split(before_options),
+            "-i", url,
+            "-vn", "-map", "0:a", "-map_metadata", "-1",
+            "-c:a", "copy" if passthrough else "libopus",
+            "-ar", "48000", "-ac", "2", "-b:a", f"{BOT_OPUS_BITRATE_KBPS}k",
+            "-loglevel", "warning",
+            "-f", "tee", f"[f=opus]pipe:1|[f=opus:onfail=ignore]{self._part_path}",
+        ]
+        discord.FFmpegAudio.__init__(self, url, args=args, stdin=subprocess.DEVNULL)
+        self._packet_iter = OggStream(self._stdout).iter_packets()
+
+    def read(self) -> bytes:
+        data = next(self._packet_iter, b"")
+        if not data and not self._finishing:
+            self._finishing = True
+            threading.Thread(target=self._finish, daemon=True).start()
+        return data
+
+    def _finish(self):
         try:
-            await state.ws_task
-        except asyncio.CancelledError:
+            ok = self._process.wait(timeout=10) == 0
+        except subprocess.TimeoutExpired:
+            ok = False
+            super().cleanup()  # Hung (e.g. stuck writing the file); cleanup() skips it while finishing
+        if ok:
+            audio_cache.commit(self._video_id, self._part_path)
+        else:
+            self._discard_part()
+
+    def _discard_part(self):
+        try:
+            os.remove(self._part_path)
+        except OSError:
             pass
-    state.room_code = room_code
-    state.session   = bot.session
-    state.ws_task   = asyncio.create_task(_run_ws(state))
 
-# ── Audio playback ─────────────────────────────────────────────────────────────
-async def _play_track(state: GuildState, track: dict, position_ms: int = 0):
-    if not state.voice_client or not state.voice_client.is_connected():
-        print("[Audio] Skipping: voice not connected")
-        return
+    def cleanup(self):
+        if self._finishing:
+            return  # _finish waits for FFmpeg to write the file trailer
+        super().cleanup()
+        self._discard_part()
+
+def _make_ffmpeg_source(source_info: dict, position_ms: int = 0, video_id: str | None = None) -> discord.AudioSource:
+    """
+    Always produce Opus packets so discord.py sends them as-is instead of
+    encoding PCM frame by frame in-process. Opus input is stream-copied
+    (no decode at all); anything else is encoded by FFmpeg's libopus.
+    A full play of a relayed track (video_id given, starting at 0) is also
+    written to the audio cache.
+    """
+    url         = source_info["url"]
+    start_ms    = max(0, position_ms)
+    passthrough = BOT_OPUS_PASSTHROUGH and _is_opus_stream(source_info.get("contentType"))
+    profile, before_options = _ffmpeg_profile(source_info, start_ms)
+    audio_log.debug("FFmpeg url=%s passthrough=%s profile=%s before_options=%r", url, passthrough, profile, before_options)
+    if video_id and audio_cache.enabled and start_ms == 0 and source_info["source"] != "cache":
+        source = TeeOpusAudio(url, video_id, passthrough=passthrough, before_options=before_options)
+    else:
+        source = discord.FFmpegOpusAudio(
+            url,
+            # discord.py stream-copies for codec="opus" and encodes with libopus otherwise
+            codec="opus" if passthrough else None,
+            bitrate=BOT_OPUS_BITRATE_KBPS,
+            before_options=before_options,
+            options="-vn",
+        )
+    source.startup = (profile, time.perf_counter())  # Read back by GaplessSource
+    _ffmpeg_sources.add(source)
+    return source
+
+def _ffmpeg_profile(source_info: dict, start_ms: int) -> tuple[str, str]:
+    """
+    FFmpeg input options for a start, named for the startup metric. Relay
+    streams probe only a little: the relay reports the content type, so
+    FFmpeg does not need to sniff the stream. Seeks add input seeking.
+    """
+    local = source_info.get("source") == "cache" or not source_info["url"].startswith(("http://", "https://"))
+    profile, options = ("file", BOT_FFMPEG_FILE_OPTIONS) if local else ("stream", BOT_FFMPEG_STREAM_OPTIONS)
+    if not local and not source_info.get("contentType"):
+        # Unknown container: let FFmpeg probe as usual
+        options = " ".join(re.sub(r"-(probesize|analyzeduration) \S+", "", options).split())
+    if start_ms > 0:
+        profile += "_seek"
+        options = f"{options} -ss {start_ms / 1000:.3f}".strip()
+    return profile, options
+
+def _advances_room(state: GuildState) -> bool:
+    """
+    Whether this guild moves the room on when a track ends. Every guild in a
+    room is host when the bot created it (they share one backend user), so
+    only the playing host guild with the lowest id does.
+    """
+    if not state.is_host:
+        return False
+    return state.guild_id == min(
+        peer.guild_id for peer in _guild_states.values()
+        if peer.room_code == state.room_code and peer.is_host
+        and (peer is state or (peer.voice_client is not None and not peer.suspended))
+    )
+
+async def _on_track_handoff(state: GuildState, prev: dict, track: dict):
+    """The audio thread moved on to the prepared next track by itself."""
     video_id = track.get("videoId")
-    if not video_id:
-        print("[Audio] Skipping: no videoId in track")
+    audio_log.info("Gapless handoff to %s", track.get("title", video_id), extra=_ctx(state))
+    state.last_track_id   = video_id
+    state.last_is_playing = True
+    state._now_playing    = track
+    # Mirror the web player: the host advances the room when a track ends.
+    if _advances_room(state):
+        await _ws_send(state, "playback_skip", {"trackId": prev.get("videoId")})
+    if state._controls:
+        state._controls.request_render()
+
+async def _on_playback_end(state: GuildState, audio: GaplessSource):
+    if audio is not state.audio:
         return
+    state.audio = None
+    if audio.ended and _advances_room(state):
+        await _ws_send(state, "playback_skip", {"trackId": audio.track.get("videoId")})
+
+# Resolves joined by the guilds of one room: (room code, videoId) -> [task, waiter count]
+_room_resolves: dict[tuple[str, str], list] = {}
+
+def _drop_room_resolve(key: tuple[str, str], task: asyncio.Task):
+    if _room_resolves.get(key, [None])[0] is task:
+        del _room_resolves[key]
+    if not task.cancelled():
+        task.exception()  # Retrieved, so a resolve nobody waited for is not logged
 
+async def _source_for(state: GuildState, video_id: str) -> dict:
+    """
+    A cached file if we have one, else the (pre)resolved relay stream.
+    Guilds in the same room join one resolve; the result is used once, by
+    whichever of them starts the decoder the others then listen to.
+    """
+    path = audio_cache.lookup(video_id)
+    if path:
+        return {"url": path, "source": "cache", "contentType": "audio/ogg; codecs=opus"}
+    if not _has_room_peers(state):
+        return await _take_resolved(state, video_id)
+    key   = (state.room_code, video_id)
+    entry = _room_resolves.get(key)
+    if entry is None:
+        task  = asyncio.create_task(_take_resolved(state, video_id))
+        task.add_done_callback(lambda t: _drop_room_resolve(key, t))
+        entry = _room_resolves[key] = [task, 0]
+    entry[1] += 1
+    try:
+        return await asyncio.shield(entry[0])
+    finally:
+        entry[1] -= 1
+        if entry[1] == 0 and not entry[0].done():
+            entry[0].cancel()
+
+async def _warm_next(state: GuildState, track: dict):
+    """Start the next track's decoder once its prefetched resolve is ready."""
+    video_id = track.get("videoId")
+    audio = state.audio
+    if audio is None or audio.next_video_id == video_id:
+        return
     try:
-        source_info = await _resolve_audio_source(state.session or bot.session, video_id)
+        source_info = await _source_for(state, video_id)
     except Exception as e:
-        print(f"[Audio] Relay failed: {e}")
-        await _send_channel_message(state, f"Relay failed: {e}")
+        audio_log.warning("Warm-up resolve failed for video=%s: %s", video_id, e)
+        PLAYBACK_ERRORS.inc(stage="warmup")
         return
-
-    start_seconds  = max(0, position_ms // 1000)
-    before_options = f"-ss {start_seconds}" if start_seconds > 0 else ""
-    print(f"[Audio] FFmpeg url={source_info['url']} before_options={before_options!r}")
-    audio_source = discord.FFmpegPCMAudio(
-        source_info["url"],
-        before_options=before_options,
-        options="-vn",
+    nxt = _next_queued_track(state.playback)
+    if audio is not state.audio or not nxt or nxt.get("videoId") != video_id:
+        return
+    if audio.next_video_id == video_id:
+        return  # Warmed by another guild sharing the decoder
+    audio.prepare_next(track, _make_ffmpeg_source(source_info, video_id=video_id))
+    audio_log.info("Warmed up next track %s", track.get("title", video_id))
+
+# Per room code, the decoder its guilds are playing (BOT_AUDIO_FANOUT)
+_room_audio: dict[str, GaplessSource] = {}
+
+def _shared_audio(state: GuildState) -> GaplessSource | None:
+    """The room's decoder, if another guild is listening to it."""
+    audio = _room_audio.get(state.room_code) if state.room_code else None
+    if audio is None:
+        return None
+    if audio.closed:
+        del _room_audio[state.room_code]
+        return None
+    others = len(audio._listeners) - (1 if audio.feeds(state.voice_client) else 0)
+    return audio if others > 0 else None
+
+def _has_room_peers(state: GuildState) -> bool:
+    """Whether another guild in voice has joined the same room."""
+    return BOT_AUDIO_FANOUT and state.room_code is not None and any(
+        peer is not state and peer.room_code == state.room_code and peer.voice_client is not None
+        for peer in _guild_states.values()
     )
 
-    if state.voice_client.is_playing() or state.voice_client.is_paused():
-        state.voice_client.stop()
+def _attach_audio(state: GuildState, audio: GaplessSource) -> bool:
+    """Play audio on the guild's VoiceClient through a listener of its own."""
+    vc = state.voice_client
+    if audio.feeds(vc) and (vc.is_playing() or vc.is_paused()):
+        state.audio = audio
+        return True
+    loop = asyncio.get_running_loop()
+
+    def on_handoff(prev: dict, nxt: dict):
+        asyncio.run_coroutine_threadsafe(_on_track_handoff(state, prev, nxt), loop)
+
+    listener = audio.listen(on_handoff)
+    if listener is None:
+        return False  # Its last listener left in the meantime
+    if vc.is_playing() or vc.is_paused():
+        vc.stop()
 
     def after_play(error):
         if error:
-            print(f"[Audio] Playback error: {error}")
+            audio_log.error("Playback error: %s", error, extra=_ctx(state))
+            PLAYBACK_ERRORS.inc(stage="player")
         else:
-            print(f"[Audio] Playback finished cleanly for video={video_id}")
+            audio_log.info("Playback finished cleanly for video=%s", audio.track.get("videoId"), extra=_ctx(state))
+        asyncio.run_coroutine_threadsafe(_on_playback_end(state, audio), loop)
+
+    state.audio = audio
+    vc.play(listener, after=after_play)
+    if state.clock_task is None or state.clock_task.done():
+        state.clock_task = asyncio.create_task(_run_clock(state))
+    return True
+
+async def _play_track(
+    state: GuildState, track: dict, position_ms: int = 0, requested_at: float | None = None,
+    *, seek: bool = False,
+):
+    vc = state.voice_client
+    if not vc or not vc.is_connected():
+        audio_log.info("Skipping: voice not connected")
+        return
+    if state.suspended:
+        return  # Seeks and resyncs wait; resuming starts at the live position
+    video_id = track.get("videoId")
+    if not video_id:
+        audio_log.warning("Skipping: no videoId in track")
+        return
+
+    # Another guild in the room already plays it: listen instead of decoding
+    # again. A seek restart only counts as done if it is near the target.
+    wanted_ms = position_ms if seek else None
+    shared = _shared_audio(state)
+    if shared is not None and shared.playing(video_id, wanted_ms) and _attach_audio(state, shared):
+        audio, source_info = shared, {"source": "shared"}
+    else:
+        audio = shared or state.audio
+        if audio is not None and audio.room != state.room_code:
+            audio = None  # Left over from another room; never replace its track
+        attached = audio is not None and audio.feeds(vc) and (vc.is_playing() or vc.is_paused())
+        if attached and position_ms < 1000 and audio.next_video_id == video_id:
+            audio.promote_next()
+            source_info = {"source": "warm"}
+        else:
+            try:
+                source_info = await _source_for(state, video_id)
+            except Exception as e:
+                audio_log.error("Relay failed for video=%s: %s", video_id, e)
+                PLAYBACK_ERRORS.inc(stage="relay")
+                await _send_channel_message(state, f"Relay failed: {e}")
+                return
+
+            shared = _shared_audio(state)  # May have started it while we resolved
+            if shared is not None and shared.playing(video_id, wanted_ms) and _attach_audio(state, shared):
+                audio, source_info = shared, {"source": "shared"}
+            else:
+                audio_source = _make_ffmpeg_source(source_info, position_ms, video_id)
+                start_ms     = max(0, position_ms)
+                audio = shared or state.audio
+                if audio is not None and audio.room != state.room_code:
+                    audio = None
+                if audio is not None and audio.feeds(vc) and (vc.is_playing() or vc.is_paused()):
+                    audio.replace(track, audio_source, start_ms=start_ms)
+                elif shared is not None and _attach_audio(state, shared):
+                    shared.replace(track, audio_source, start_ms=start_ms)
+                    audio = shared
+                else:
+                    audio = GaplessSource(track, audio_source, start_ms=start_ms, room=state.room_code)
+                    if BOT_AUDIO_FANOUT and state.room_code:
+                        _room_audio[state.room_code] = audio
+                    _attach_audio(state, audio)
+
+    if requested_at is not None:
+        audio.time_first_frame(requested_at)
 
-    state.voice_client.play(audio_source, after=after_play)
     state.last_track_id   = video_id
     state.last_is_playing = True
     state._now_playing    = track
 
-    print(f"[Audio] Playing: {track.get('title', video_id)} [{source_info['source']}]")
+    audio_log.info("Playing: %s [%s]", track.get("title", video_id), source_info["source"])
+    sessions.save(state)
 
     if state.playback and state.playback.get("isPlaying") is False:
-        state.voice_client.pause()
+        vc.pause()
         state.last_is_playing = False
+    elif vc.is_paused():
+        vc.resume()
 
     if state._controls:
-        asyncio.create_task(state._controls.update_display())
+        state._controls.request_render()
+
+async def _seek_audio(state: GuildState, track: dict, position_ms: int):
+    """Seek inside the running stream when possible, else restart at the position."""
+    vc    = state.voice_client
+    audio = state.audio
+    if audio is not None and audio.feeds(vc) and audio.track.get("videoId") == track.get("videoId"):
+        if audio.shared and audio.playing(track.get("videoId"), position_ms):
+            return  # Another guild in the room already seeked the shared decoder
+        if audio.seek(position_ms):
+            audio_log.info("Seek to %dms served from the running stream", position_ms)
+            return
+    await _play_track(state, track, position_ms, seek=True)
+
+async def _debounced_seek(state: GuildState):
+    await asyncio.sleep(BOT_SEEK_DEBOUNCE_MS / 1000)
+    playback = state.playback
+    if not playback or not playback.get("currentItem"):
+        return
+    await _seek_audio(state, playback["currentItem"], _live_position_ms(playback))
 
 def _sync_playback(state: GuildState):
+    requested_at, state.now_playing_at = state.now_playing_at, None
+    _update_idle(state)
+    if state.suspended:
+        return
+    _schedule_prefetch(state)
     playback = state.playback
     if not playback or not playback.get("currentItem"):
         return
@@ -456,11 +2259,13 @@ def _sync_playback(state: GuildState):
         return
 
     if state.last_track_id != current_id:
-        asyncio.create_task(
-            _play_track(state, track, playback.get("positionMs", 0))
-        )
+        if not state.player.targets(current_id):
+            state.player.submit(current_id, _play_track, track, playback.get("positionMs", 0), requested_at)
         return
 
+    _apply_play_state(state, playback)
+
+def _apply_play_state(state: GuildState, playback: dict):
     vc = state.voice_client
     if not vc:
         return
@@ -472,30 +2277,218 @@ def _sync_playback(state: GuildState):
             vc.pause()
         state.last_is_playing = is_playing
 
+def _queue_version(playback: dict | None) -> tuple:
+    playback = playback or {}
+    return (
+        tuple(t.get("videoId") for t in playback.get("queue") or []),
+        tuple(t.get("videoId") for t in playback.get("autoplayQueue") or []),
+    )
+
+def _resync_playback(state: GuildState, previous: dict):
+    """
+    Reconcile a fresh room_state with the playback we knew before the socket
+    dropped. Audio is only restarted when the track changed, the decoder died,
+    or the room's timeline moved (e.g. a seek) by more than
+    BOT_RESYNC_TOLERANCE_MS; otherwise the running stream is left alone.
+    """
+    fresh = state.playback
+    track = (fresh or {}).get("currentItem")
+    if not track or not track.get("videoId"):
+        _sync_playback(state)
+        return
+
+    vc = state.voice_client
+    audio_alive = vc is not None and (vc.is_playing() or vc.is_paused())
+    if track["videoId"] != state.last_track_id or not audio_alive:
+        ws_log.info("Resync: restarting audio for %s", track.get("title", track["videoId"]))
+        state.last_track_id = None
+        _sync_playback(state)
+        return
+
+    drift_ms = abs(_live_position_ms(fresh) - _live_position_ms(previous))
+    if drift_ms > BOT_RESYNC_TOLERANCE_MS:
+        ws_log.info("Resync: room position moved %dms, seeking", drift_ms)
+        state.player.submit(track["videoId"], _seek_audio, track, _live_position_ms(fresh))
+    if _queue_version(fresh) != _queue_version(previous):
+        _schedule_prefetch(state)
+    _apply_play_state(state, fresh)
+
+# ── Playback clock ─────────────────────────────────────────────────────────────
+async def _run_clock(state: GuildState):
+    """
+    Every BOT_POSITION_REPORT_SEC, report the position measured from frames
+    actually sent and compare it with the room's live position. Drift is only
+    corrected (by restarting at the room position) past BOT_DRIFT_THRESHOLD_MS,
+    and at most once per cooldown so a slow decoder start cannot cause a loop.
+    """
+    cooldown        = max(15.0, BOT_POSITION_REPORT_SEC * 3)
+    last_correction = 0.0
+    while state.voice_client is not None:
+        await asyncio.sleep(BOT_POSITION_REPORT_SEC)
+        audio, playback, vc = state.audio, state.playback, state.voice_client
+        if audio is None or not playback or vc is None or not vc.is_playing():
+            continue
+        track = playback.get("currentItem") or {}
+        if track.get("videoId") != audio.track.get("videoId"):
+            continue  # Local handoff the room has not caught up with yet
+        local_ms  = audio.position_ms
+        room_ms   = _live_position_ms(playback)
+        drift_ms  = local_ms - room_ms if playback.get("isPlaying") else 0
+        await _ws_send(state, "playback_position_report", {
+            "trackId":    track.get("videoId"),
+            "positionMs": local_ms,
+            "driftMs":    drift_ms,
+            "clientTime": int(time.time() * 1000),
+        })
+        sessions.save(state)
+        duration_ms = int(track.get("durationMs") or 0)
+        if (
+            abs(drift_ms) > BOT_DRIFT_THRESHOLD_MS
+            and (not duration_ms or room_ms < duration_ms)
+            and time.monotonic() - last_correction > cooldown
+        ):
+            last_correction = time.monotonic()
+            clock_log.info("Drift %dms on %s, resyncing to %dms", drift_ms, track.get("videoId"), room_ms, extra=_ctx(state))
+            state.player.submit(track.get("videoId"), _seek_audio, track, room_ms)
+
+# ── Prefetch ───────────────────────────────────────────────────────────────────
+def _live_position_ms(playback: dict) -> int:
+    """Live position per API_STANDARDS.md: positionMs + elapsed while playing."""
+    position = int(playback.get("positionMs") or 0)
+    if playback.get("isPlaying") and playback.get("serverTime"):
+        position += max(0, int(time.time() * 1000) - int(playback["serverTime"]))
+    return position
+
+def _next_queued_track(playback: dict | None) -> dict | None:
+    if not playback:
+        return None
+    for key in ("queue", "autoplayQueue"):
+        items = playback.get(key) or []
+        if items and items[0].get("videoId"):
+            return items[0]
+    return None
+
+async def _take_resolved(state: GuildState, video_id: str) -> dict:
+    """Use a prefetched (or in-flight) resolve if one exists, else resolve now."""
+    task = state.resolved.take(video_id)
+    if task is not None:
+        try:
+            source_info = await asyncio.shield(task)
+            prefetch_log.info("Hit for video=%s", video_id)
+            return source_info
+        except asyncio.CancelledError:
+            if not task.cancelled():
+                # Superseded: keep the resolve if the new target still wants it
+                if state.player.video_id == video_id:
+                    state.resolved.restore(video_id, task)
+                else:
+                    task.cancel()
+                raise
+        except Exception as e:
+            prefetch_log.warning("Cached resolve failed for video=%s: %s", video_id, e)
+    return await _resolve_audio_source(video_id)
+
+def _prefetch_owner(state: GuildState) -> bool:
+    """Of the guilds sharing a decoder, only one prefetches for it."""
+    audio = state.audio
+    if audio is None or not audio.shared:
+        return True
+    return state.guild_id == min(s.guild_id for s in _guild_states.values() if s.audio is audio)
+
+async def _prefetch_after(state: GuildState, track: dict, delay: float):
+    video_id = track["videoId"]
+    try:
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if not _prefetch_owner(state):
+            return
+        if not audio_cache.lookup(video_id):
+            prefetch_log.info("Resolving next video=%s", video_id)
+            state.resolved.start(video_id)
+        if state.audio is not None:
+            await _warm_next(state, track)
+    except asyncio.CancelledError:
+        pass
+
+def _schedule_prefetch(state: GuildState):
+    """
+    Resolve the next queued track shortly before the current one ends, so the
+    track change in _play_track can start FFmpeg without a relay round trip.
+    The resolve is delayed until BOT_PREFETCH_LEAD_MS before the end because
+    the proxy URL it returns expires on the backend.
+    """
+    playback = state.playback
+    if not state.voice_client or state.suspended:
+        return
+    nxt = _next_queued_track(playback)
+    video_id = nxt.get("videoId") if nxt else None
+
+    if state.prefetch_task and not state.prefetch_task.done():
+        state.prefetch_task.cancel()
+    state.prefetch_task = None
+    warmed = state.audio.next_video_id if state.audio is not None else None
+    if warmed and warmed != video_id:
+        state.audio.drop_next()
+    if not video_id or warmed == video_id or state.resolved.has(video_id):
+        return
+
+    current = (playback or {}).get("currentItem") or {}
+    duration_ms = int(current.get("durationMs") or 0)
+    if duration_ms and not playback.get("isPlaying", True):
+        return  # Paused: reschedule on the next playback_state
+    delay = 0.0
+    if duration_ms:
+        remaining_ms = duration_ms - _live_position_ms(playback)
+        delay = max(0, remaining_ms - BOT_PREFETCH_LEAD_MS) / 1000
+    state.prefetch_task = asyncio.create_task(_prefetch_after(state, nxt, delay))
+
 # ── Utility ────────────────────────────────────────────────────────────────────
+def _read_state(name: str) -> str | None:
+    """A small file from BOT_STATE_DIR, or None if it is missing or unreadable."""
+    try:
+        with open(os.path.join(BOT_STATE_DIR, name), encoding="utf-8") as f:
+            return f.read()
+    except OSError:
+        return None
+
+def _write_state(name: str, content: str):
+    """Atomically replace a file in BOT_STATE_DIR; failures are only logged."""
+    path = os.path.join(BOT_STATE_DIR, name)
+    try:
+        os.makedirs(BOT_STATE_DIR, exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(tmp, path)
+    except OSError as e:
+        bot_log.warning("Cannot write %s: %s", path, e)
+
+def _check_state_dir():
+    """Warn when BOT_STATE_DIR is missing, i.e. it is new or not on persistent storage."""
+    if not os.path.isdir(BOT_STATE_DIR):
+        bot_log.warning(
+            "State directory %s does not exist yet, so nothing from a previous run is kept; "
+            "if this is logged on every start, put it on persistent storage", os.path.abspath(BOT_STATE_DIR),
+        )
+
 async def _connect_voice(state: GuildState, channel: discord.VoiceChannel) -> bool:
     try:
         if state.voice_client and state.voice_client.is_connected():
             await state.voice_client.disconnect(force=True)
-        print(f"[Voice] Attempting to connect to {channel.name} ({channel.id})")
+        voice_log.info("Attempting to connect to %s (%s)", channel.name, channel.id)
         vc = await channel.connect()
         state.voice_client     = vc
         state.voice_channel_id = channel.id
-        print(f"[Voice] Connected to {channel.name} ({channel.id})")
+        voice_log.info("Connected to %s (%s)", channel.name, channel.id)
+        sessions.save(state, urgent=True)
         return True
     except Exception as e:
-        import traceback
-        print(f"[Voice] Failed to connect: {e}")
-        traceback.print_exc()
+        voice_log.error("Failed to connect: %s", e, exc_info=True, extra=_ctx(state))
         return False
 
 async def _cleanup_state(state: GuildState):
-    if state.ws_task and not state.ws_task.done():
-        state.ws_task.cancel()
-        try:
-            await state.ws_task
-        except asyncio.CancelledError:
-            pass
+    sessions.forget(state.guild_id)
+    await ws_manager.unsubscribe(state)
     if state.voice_client and state.voice_client.is_connected():
         try:
             await state.voice_client.disconnect(force=True)
@@ -511,7 +2504,423 @@ async def _send_channel_message(state: GuildState, content: str):
         if channel and hasattr(channel, "send"):
             await channel.send(content)
     except Exception as e:
-        print(f"[Bot] Failed to send message: {e}")
+        bot_log.warning("Failed to send message: %s", e, extra=_ctx(state))
+
+# ── Sessions ───────────────────────────────────────────────────────────────────
+class SessionStore:
+    """
+    Each guild's session (room, channels, current track and position) in
+    SQLite, so a restarted bot can rejoin where it was. save() only marks the
+    guild dirty; a flush task snapshots dirty guilds every BOT_SESSION_SAVE_SEC
+    (right away for joins and leaves) and a single writer thread commits them,
+    so the event loop never waits on the disk.
+    """
+    def __init__(self, path: str):
+        self.path     = path
+        self.enabled  = bool(path)
+        self._dirty: set[GuildState] = set()
+        self._gone: set[int] = set()
+        self._wake: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sessions")
+        self._db: sqlite3.Connection | None = None  # Only used on the writer thread
+
+    def save(self, state: GuildState, urgent: bool = False):
+        if not self.enabled:
+            return
+        self._gone.discard(state.guild_id)
+        self._dirty.add(state)
+        self._schedule(urgent)
+
+    def forget(self, guild_id: int):
+        if not self.enabled:
+            return
+        self._dirty = {s for s in self._dirty if s.guild_id != guild_id}
+        self._gone.add(guild_id)
+        self._schedule(urgent=True)
+
+    def _schedule(self, urgent: bool):
+        if self._task is None or self._task.done():
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._flush_loop())
+        if urgent:
+            self._wake.set()
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), BOT_SESSION_SAVE_SEC)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+    @staticmethod
+    def _snapshot(state: GuildState) -> dict | None:
+        if not state.room_code:
+            return None
+        audio = state.audio
+        return {
+            "room_code":        state.room_code,
+            "voice_channel_id": state.voice_channel_id,
+            "text_channel_id":  state.text_channel_id,
+            "video_id":         state.last_track_id,
+            "position_ms":      audio.position_ms if audio is not None else 0,
+            "is_playing":       state.last_is_playing,
+        }
+
+    async def flush(self):
+        if not self._dirty and not self._gone:
+            return
+        rows, gone = [], set(self._gone)
+        for state in self._dirty:
+            snapshot = self._snapshot(state)
+            if snapshot is None:
+                gone.add(state.guild_id)
+            else:
+                rows.append((state.guild_id, json.dumps(snapshot), time.time()))
+        self._dirty.clear()
+        self._gone.clear()
+        await asyncio.get_running_loop().run_in_executor(self._executor, self._write, rows, gone)
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(self.path, timeout=10)
+            self._db.execute("PRAGMA journal_mode=WAL")  # Shard processes share the file
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS sessions "
+                "(guild_id INTEGER PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+        return self._db
+
+    def _write(self, rows: list[tuple], gone: set[int]):
+        try:
+            db = self._connect()
+            with db:
+                db.executemany("REPLACE INTO sessions VALUES (?, ?, ?)", rows)
+                db.executemany("DELETE FROM sessions WHERE guild_id = ?", [(g,) for g in gone])
+        except sqlite3.Error as e:
+            bot_log.warning("Cannot save sessions to %s: %s", self.path, e)
+
+    def _read(self, max_age_sec: float) -> list[tuple[int, dict]]:
+        try:
+            db = self._connect()
+            with db:
+                db.execute("DELETE FROM sessions WHERE updated_at < ?", (time.time() - max_age_sec,))
+            return [(guild_id, json.loads(data)) for guild_id, data in db.execute("SELECT guild_id, data FROM sessions")]
+        except (sqlite3.Error, ValueError) as e:
+            bot_log.warning("Cannot read sessions from %s: %s", self.path, e)
+            return []
+
+    async def load(self) -> list[tuple[int, dict]]:
+        if not self.enabled:
+            return []
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, self._read, BOT_SESSION_MAX_AGE_SEC
+        )
+
+sessions = SessionStore(BOT_SESSION_DB)
+
+def _owns_guild(guild_id: int) -> bool:
+    """Whether this process's shards include the guild (always true unsharded)."""
+    if not BOT_SHARD_IDS:
+        return True
+    return (guild_id >> 22) % BOT_SHARD_COUNT in BOT_SHARD_IDS
+
+async def _resume_sessions():
+    """
+    Rejoin the rooms and voice channels saved before a restart, a few guilds
+    at a time. The saved track is resolved while voice and the room connect;
+    the room's own state then decides the track and position, normally the
+    saved track a little further on, and its start finds the resolve ready.
+    """
+    saved = [(g, data) for g, data in await sessions.load() if _owns_guild(g)]
+    if not saved:
+        return
+    bot_log.info("Resuming %d session(s)", len(saved))
+    limit = asyncio.Semaphore(max(1, BOT_RESUME_CONCURRENCY))
+
+    async def resume(guild_id: int, data: dict):
+        guild   = bot.get_guild(guild_id)
+        channel = guild.get_channel(data.get("voice_channel_id") or 0) if guild else None
+        if not isinstance(channel, (discord.VoiceChannel, discord.StageChannel)) or not data.get("room_code"):
+            sessions.forget(guild_id)  # Removed from the guild, or the channel is gone
+            return
+        async with limit:
+            state = get_guild_state(guild_id)
+            if state.room_code:
+                return  # Someone ran /join while we were starting
+            state.text_channel_id = data.get("text_channel_id")
+            video_id = data.get("video_id")
+            if video_id and not audio_cache.lookup(video_id):
+                state.resolved.start(video_id)
+            connected, _ = await asyncio.gather(
+                _connect_voice(state, channel), _connect_room(state, data["room_code"])
+            )
+            if not connected:
+                await _cleanup_state(state)
+                return
+            _sync_playback(state)  # room_state may have arrived before voice was up
+
+    results = await asyncio.gather(*(resume(g, data) for g, data in saved), return_exceptions=True)
+    for (guild_id, _), result in zip(saved, results):
+        if isinstance(result, Exception):
+            bot_log.warning("Resume failed for guild=%s: %s", guild_id, result)
+
+# ── Idle reclamation ───────────────────────────────────────────────────────────
+# A guild is idle while nobody (other than bots) is in its voice channel or the
+# room is paused. After BOT_IDLE_SUSPEND_SEC its decoder is stopped; the room
+# is still followed, and audio restarts at the room position as soon as it is
+# active again. After BOT_IDLE_DISCONNECT_SEC the bot leaves the room and the
+# channel. A hosting bot keeps playing to an empty channel, since the room's
+# track changes depend on it. Guild state nobody has used for a while is dropped.
+IDLE_CHECK_SEC = 15
+IDLE_EVICT_SEC = 600
+
+def _listeners(state: GuildState) -> int:
+    vc = state.voice_client
+    if vc is None or not vc.is_connected() or vc.channel is None:
+        return 0
+    return sum(1 for member in vc.channel.members if not member.bot)
+
+def _update_idle(state: GuildState):
+    playing = bool(state.playback and state.playback.get("isPlaying", True))
+    if playing and _listeners(state):
+        state.idle_since = None
+        if state.suspended:
+            audio_log.info("Listeners are back, resuming audio", extra=_ctx(state))
+            state.suspended     = False
+            state.last_track_id = None
+            track = state.playback.get("currentItem")
+            if track and track.get("videoId"):
+                # The room kept going meanwhile: start at its live position
+                state.player.submit(track["videoId"], _play_track, track, _live_position_ms(state.playback))
+            _schedule_prefetch(state)
+    elif state.idle_since is None:
+        state.idle_since = time.monotonic()
+
+def _suspend_audio(state: GuildState):
+    audio_log.info("Nobody listening, stopping the decoder", extra=_ctx(state))
+    state.suspended = True
+    state.player.cancel()
+    if state.prefetch_task and not state.prefetch_task.done():
+        state.prefetch_task.cancel()
+    state.resolved.clear()
+    vc = state.voice_client
+    if vc is not None and (vc.is_playing() or vc.is_paused()):
+        vc.stop()  # Cleans up FFmpeg on the audio thread
+    state.audio         = None
+    state.last_track_id = None
+
+async def _idle_loop():
+    while True:
+        await asyncio.sleep(IDLE_CHECK_SEC)
+        now = time.monotonic()
+        for room_code, audio in list(_room_audio.items()):
+            if audio.closed:
+                del _room_audio[room_code]
+        for guild_id, state in list(_guild_states.items()):
+            if state.voice_client is None and not state.room_code:
+                if now - state.last_used > IDLE_EVICT_SEC:
+                    del _guild_states[guild_id]
+                continue
+            _update_idle(state)
+            if state.idle_since is None:
+                continue
+            idle_for = now - state.idle_since
+            if BOT_IDLE_DISCONNECT_SEC and idle_for >= BOT_IDLE_DISCONNECT_SEC:
+                bot_log.info("Idle for %ds, leaving", idle_for, extra=_ctx(state))
+                await _send_channel_message(state, "👋 Left the room after being idle with nobody listening.")
+                await _cleanup_state(state)
+            elif (
+                BOT_IDLE_SUSPEND_SEC and idle_for >= BOT_IDLE_SUSPEND_SEC and not state.suspended
+                and not (state.is_host and state.playback and state.playback.get("isPlaying"))
+            ):
+                _suspend_audio(state)
+
+# ── Search cache ───────────────────────────────────────────────────────────────
+async def _search_tracks(query: str, limit: int) -> list[dict]:
+    if BOT_SUPERVISOR_URL:
+        # The supervisor's cache is shared by every shard process
+        data = await _supervisor_call("/search", {"q": query, "limit": limit})
+        return data["results"]
+    resp = await backend.request(f"/api/search?q={quote(query)}&limit={limit}")
+    if not resp.ok:
+        raise RuntimeError(f"Search failed ({resp.status}): {resp.text()}")
+    return resp.json().get("results", [])
+
+class SearchCache:
+    """
+    Shared LRU + TTL cache of /api/search results, keyed by the normalized
+    query. Size is capped by an estimate of the cached JSON bytes. Identical
+    searches that are already in flight are joined rather than re-sent, and a
+    search is cancelled once nobody is waiting for it any more.
+    """
+    def __init__(self, ttl_sec: float, max_bytes: int):
+        self.ttl_sec   = ttl_sec
+        self.max_bytes = max_bytes
+        self._bytes    = 0
+        self._entries: OrderedDict[str, tuple[float, int, list[dict]]] = OrderedDict()
+        self._inflight: dict[str, list] = {}  # key -> [task, waiter count]
+
+    @staticmethod
+    def key(query: str, limit: int) -> str:
+        return f"{limit}:{' '.join(query.lower().split())}"
+
+    def get(self, key: str) -> list[dict] | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, size, results = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self._bytes -= size
+            return None
+        self._entries.move_to_end(key)
+        return results
+
+    def put(self, key: str, results: list[dict]):
+        size = len(key) + len(json.dumps(results))
+        if size > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old:
+            self._bytes -= old[1]
+        self._entries[key] = (time.monotonic() + self.ttl_sec, size, results)
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            _, (_, evicted, _) = self._entries.popitem(last=False)
+            self._bytes -= evicted
+
+    async def _fetch(self, key: str, query: str, limit: int):
+        try:
+            results = await _search_tracks(query, limit)
+            self.put(key, results)
+            return results
+        finally:
+            self._inflight.pop(key, None)
+
+    async def search(self, query: str, limit: int) -> list[dict]:
+        key = self.key(query, limit)
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+        entry = self._inflight.get(key)
+        if entry is None:
+            task  = asyncio.create_task(self._fetch(key, query, limit))
+            entry = self._inflight[key] = [task, 0]
+        entry[1] += 1
+        try:
+            return await asyncio.shield(entry[0])
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0 and not entry[0].done():
+                entry[0].cancel()
+
+search_cache = SearchCache(BOT_SEARCH_CACHE_TTL_SEC, BOT_SEARCH_CACHE_BYTES)
+
+_TOKEN_RE = re.compile(r"\w+")
+
+def _tokenize(text: str) -> list[str]:
+    return _TOKEN_RE.findall(text.lower())
+
+class TrackIndex:
+    """
+    In-memory index of every track the bot has seen (search results, queues,
+    now playing), shared across guilds. Title and artist are split into
+    tokens; a query matches a track when each query token is a prefix of one
+    of its tokens. Tokens are kept sorted so a prefix is a bisect range.
+    Holds at most max_tracks tracks, least recently seen evicted first.
+    """
+    def __init__(self, max_tracks: int):
+        self.max_tracks = max_tracks
+        self._tracks: OrderedDict[str, Track] = OrderedDict()
+        self._postings: dict[str, set[str]] = {}
+        self._sorted_tokens: list[str] = []
+
+    def __len__(self) -> int:
+        return len(self._tracks)
+
+    def get(self, video_id: str) -> Track | None:
+        return self._tracks.get(video_id)
+
+    @staticmethod
+    def _track_tokens(track: Track) -> set[str]:
+        return set(_tokenize(f"{track.get('title', '')} {track.get('artist', '')}"))
+
+    def add(self, track: dict | Track):
+        video_id = track.get("videoId")
+        if not video_id:
+            return
+        track = Track.of(track)
+        if video_id in self._tracks:
+            self._tracks[video_id] = track
+            self._tracks.move_to_end(video_id)
+            return
+        self._tracks[video_id] = track
+        for token in self._track_tokens(track):
+            posting = self._postings.get(token)
+            if posting is None:
+                posting = self._postings[token] = set()
+                insort(self._sorted_tokens, token)
+            posting.add(video_id)
+        while len(self._tracks) > self.max_tracks:
+            self._evict()
+
+    def add_many(self, tracks: list[dict]):
+        for track in tracks:
+            self.add(track)
+
+    def _evict(self):
+        video_id, track = self._tracks.popitem(last=False)
+        for token in self._track_tokens(track):
+            posting = self._postings.get(token)
+            if posting is None:
+                continue
+            posting.discard(video_id)
+            if not posting:
+                del self._postings[token]
+                del self._sorted_tokens[bisect_left(self._sorted_tokens, token)]
+
+    def _prefix_matches(self, prefix: str) -> set[str]:
+        matches: set[str] = set()
+        i = bisect_left(self._sorted_tokens, prefix)
+        while i < len(self._sorted_tokens) and self._sorted_tokens[i].startswith(prefix):
+            matches |= self._postings[self._sorted_tokens[i]]
+            i += 1
+        return matches
+
+    def search(self, query: str, limit: int) -> list[Track]:
+        tokens = sorted(set(_tokenize(query)), key=len, reverse=True)
+        if not tokens:
+            return []
+        candidates: set[str] | None = None
+        for token in tokens:  # Longest (most selective) prefix first
+            matches = self._prefix_matches(token)
+            candidates = matches if candidates is None else candidates & matches
+            if not candidates:
+                return []
+        normalized = " ".join(_tokenize(query))
+
+        def rank(video_id: str):
+            title = " ".join(_tokenize(self._tracks[video_id].get("title", "")))
+            return not title.startswith(normalized)
+
+        # Most recently seen first, then titles that start with the query
+        ordered = [vid for vid in reversed(self._tracks) if vid in candidates]
+        ordered.sort(key=rank)
+        return [self._tracks[vid] for vid in ordered[:limit]]
+
+track_index = TrackIndex(BOT_TRACK_CACHE_SIZE)
+
+def _index_playback(playback: dict | None):
+    if not playback:
+        return
+    if playback.get("currentItem"):
+        track_index.add(playback["currentItem"])
+    track_index.add_many(playback.get("queue") or [])
+    track_index.add_many(playback.get("autoplayQueue") or [])
 
 # ── Slash commands ─────────────────────────────────────────────────────────────
 
@@ -527,16 +2936,14 @@ async def cmd_create(interaction: discord.Interaction):
     state.text_channel_id = interaction.channel_id
 
     try:
-        resp = await _api_fetch(
-            bot.session,
+        resp = await backend.request(
             "/api/rooms",
             method="POST",
             json={"settings": {}},
         )
         if not resp.ok:
-            text = await resp.text()
-            raise RuntimeError(f"Room creation failed ({resp.status}): {text}")
-        data      = await resp.json()
+            raise RuntimeError(f"Room creation failed ({resp.status}): {resp.text()}")
+        data      = resp.json()
         room      = data.get("room", {})
         join_code = room.get("joinCode")
         room_id   = room.get("id")
@@ -609,19 +3016,73 @@ async def cmd_queue(interaction: discord.Interaction):
     )
 
 
-# Per-guild autocomplete track cache: { guild_id: { videoId: TrackObject } }
-_track_cache: dict[int, dict[str, dict]] = {}
+# Latest in-progress autocomplete search per user; a newer keystroke drops it.
+_autocomplete_pending: dict[int, asyncio.Task] = {}
 
-def _cache_tracks(guild_id: int, tracks: list[dict]):
-    if guild_id not in _track_cache:
-        _track_cache[guild_id] = {}
-    for t in tracks:
-        vid = t.get("videoId")
-        if vid:
-            _track_cache[guild_id][vid] = t
+def _index_search_results(task: asyncio.Task):
+    if not task.cancelled() and task.exception() is None:
+        track_index.add_many(task.result())
 
-def _get_cached_track(guild_id: int, video_id: str) -> dict | None:
-    return _track_cache.get(guild_id, {}).get(video_id)
+def _track_choices(tracks: list[dict]) -> list[app_commands.Choice[str]]:
+    choices = []
+    for track in tracks:
+        title    = track.get("title", "Unknown")
+        artist   = track.get("artist", "Unknown")
+        video_id = track.get("videoId", "")
+        if not video_id:
+            continue
+        label = f"{title} — {artist}"[:100]
+        choices.append(app_commands.Choice(name=label, value=video_id))
+        if len(choices) == 25:
+            break
+    return choices
+
+
+def _looks_like_video_id(query: str) -> bool:
+    return bool(query) and len(query) <= 12 and " " not in query
+
+async def _lookup_track(video_id: str) -> dict | None:
+    try:
+        resp = await backend.request(f"/api/search/track/{quote(video_id)}")
+    except Exception as e:
+        search_log.debug("Track lookup %s failed: %s", video_id, e)
+        return None
+    return resp.json().get("track") if resp.ok else None
+
+async def _resolve_query(query: str) -> dict | None:
+    """
+    Resolve what a user typed (an autocomplete video ID or free text) to a
+    track. Something that could be an ID is looked up and searched at the
+    same time: an ID hit wins, otherwise the search is already under way.
+    """
+    track = track_index.get(query)
+    if track is not None:
+        return track
+
+    # Same key as autocomplete, so a typed-then-submitted query is a cache hit
+    search = asyncio.ensure_future(search_cache.search(query, 25))
+    lookup = asyncio.ensure_future(_lookup_track(query)) if _looks_like_video_id(query) else None
+    try:
+        if lookup is not None:
+            done, _ = await asyncio.wait({search, lookup}, return_when=asyncio.FIRST_COMPLETED)
+            if search in done and not search.exception():
+                results = search.result()
+                if results and results[0].get("videoId") == query:
+                    return results[0]
+            track = await lookup
+            if track is not None:
+                return track
+        results = await search
+        return results[0] if results else None
+    finally:
+        for task in (search, lookup):
+            if task is None:
+                continue
+            if task.done():
+                if not task.cancelled():
+                    task.exception()  # Retrieved, so a lost race is not logged
+            else:
+                task.cancel()
 
 
 @bot.tree.command(name="add", description="Search and add a track to the SpotiSync queue")
@@ -636,34 +3097,12 @@ async def cmd_add(interaction: discord.Interaction, query: str):
 
     await interaction.response.defer()
     try:
-        track = _get_cached_track(interaction.guild_id, query)
-
+        track = await _resolve_query(query)
         if track is None:
-            if query and len(query) <= 12 and " " not in query:
-                resp = await _api_fetch(
-                    state.session or bot.session,
-                    f"/api/search/track/{quote(query)}",
-                )
-                if resp.ok:
-                    data  = await resp.json()
-                    track = data.get("track")
-
-            if track is None:
-                resp = await _api_fetch(
-                    state.session or bot.session,
-                    f"/api/search?q={quote(query)}&limit=1",
-                )
-                if not resp.ok:
-                    text = await resp.text()
-                    raise RuntimeError(f"Search failed ({resp.status}): {text}")
-                data    = await resp.json()
-                results = data.get("results", [])
-                if not results:
-                    await interaction.followup.send(f"No results for: {query}")
-                    return
-                track = results[0]
-
-        await _ws_send(state, "queue_add", {"item": track})
+            await interaction.followup.send(f"No results for: {query}")
+            return
+
+        await _ws_send(state, "queue_add", {"item": Track.of(track).to_dict()})
         await interaction.followup.send(
             f"➕ Added: **{track.get('title', '?')}** — {track.get('artist', '?')}"
         )
@@ -678,32 +3117,149 @@ async def autocomplete_add(
 ) -> list[app_commands.Choice[str]]:
     if not current.strip():
         return []
+    local = track_index.search(current, 25)
+    if len(local) >= BOT_AUTOCOMPLETE_LOCAL_MIN:
+        return _track_choices(local)
+
+    user_id = interaction.user.id
+    prev = _autocomplete_pending.get(user_id)
+    if prev and not prev.done():
+        prev.cancel()  # The user has typed past it; its response would be discarded
+    pending = asyncio.create_task(search_cache.search(current, 25))
+    pending.add_done_callback(_index_search_results)
+    _autocomplete_pending[user_id] = pending
     try:
-        resp = await _api_fetch(
-            bot.session,
-            f"/api/search?q={quote(current)}&limit=25",
+        try:
+            # Answer with what we have rather than miss Discord's 3 s window;
+            # the search keeps running and lands in the cache and index.
+            results = await asyncio.wait_for(
+                asyncio.shield(pending), BOT_AUTOCOMPLETE_DEADLINE_MS / 1000
+            )
+        except asyncio.TimeoutError:
+            return _track_choices(local)
+        except asyncio.CancelledError:
+            if pending.cancelled() and not asyncio.current_task().cancelling():
+                return []
+            raise
+        finally:
+            if _autocomplete_pending.get(user_id) is pending:
+                del _autocomplete_pending[user_id]
+
+        seen = {t["videoId"] for t in local}
+        return _track_choices(local + [t for t in results if t.get("videoId") not in seen])
+    except Exception as e:
+        search_log.warning("Error: %s", e)
+        return []
+
+
+# Matches the backend's cap on one batched queue_add.
+QUEUE_BATCH_MAX = 200
+BULK_PROGRESS_EDIT_SEC = 1.5
+BULK_FILE_MAX_BYTES = 256 * 1024
+
+def _parse_bulk_queries(text: str) -> list[str]:
+    queries, seen = [], set()
+    for part in re.split(r"[\n;]", text):
+        query = part.strip()
+        key   = " ".join(query.lower().split())
+        if query and key not in seen:
+            seen.add(key)
+            queries.append(query)
+    return queries
+
+@bot.tree.command(name="addmany", description="Add many tracks to the SpotiSync queue at once")
+@app_commands.describe(
+    queries="Song names or IDs, separated by ;",
+    file="A text file with one song name or ID per line",
+)
+async def cmd_addmany(
+    interaction: discord.Interaction,
+    queries: str | None = None,
+    file: discord.Attachment | None = None,
+):
+    state = get_guild_state(interaction.guild_id)
+    if not state.ws:
+        await interaction.response.send_message(
+            "❌ Not connected to a room. Use /join or /create first.", ephemeral=True
         )
-        if not resp.ok:
-            return []
-        data    = await resp.json()
-        results = data.get("results", [])
+        return
+    if file is not None and file.size > BULK_FILE_MAX_BYTES:
+        await interaction.response.send_message(
+            f"❌ The file is too large (max {BULK_FILE_MAX_BYTES // 1024} KB).", ephemeral=True
+        )
+        return
 
-        _cache_tracks(interaction.guild_id, results)
+    await interaction.response.defer()
+    text = queries or ""
+    if file is not None:
+        text += "\n" + (await file.read()).decode("utf-8", errors="replace")
+    wanted = _parse_bulk_queries(text)
+    if not wanted:
+        await interaction.followup.send("Nothing to add. Give song names or attach a text file.")
+        return
+    skipped = max(0, len(wanted) - BOT_BULK_ADD_MAX)
+    wanted  = wanted[:BOT_BULK_ADD_MAX]
+
+    results: list[dict | None] = [None] * len(wanted)
+    done = 0
+    limit = asyncio.Semaphore(max(1, BOT_BULK_ADD_CONCURRENCY))
+
+    async def resolve(i: int, query: str):
+        nonlocal done
+        async with limit:
+            try:
+                results[i] = await _resolve_query(query)
+            except Exception as e:
+                search_log.warning("Bulk add lookup %r failed: %s", query, e, extra=_ctx(state))
+        done += 1
+
+    def progress() -> str:
+        return f"🔎 Looking up tracks… {done}/{len(wanted)}"
+
+    message = await interaction.followup.send(progress(), wait=True)
+
+    async def report():
+        # One message edited in place, at most every BULK_PROGRESS_EDIT_SEC
+        shown = 0
+        while True:
+            await asyncio.sleep(BULK_PROGRESS_EDIT_SEC)
+            if done != shown:
+                shown = done
+                try:
+                    await message.edit(content=progress())
+                except discord.HTTPException:
+                    pass
+
+    reporter = asyncio.create_task(report())
+    try:
+        await asyncio.gather(*(resolve(i, q) for i, q in enumerate(wanted)))
+    finally:
+        reporter.cancel()
 
-        choices = []
-        for track in results:
-            title    = track.get("title", "Unknown")
-            artist   = track.get("artist", "Unknown")
-            video_id = track.get("videoId", "")
-            if not video_id:
-                continue
-            label = f"{title} — {artist}"[:100]
-            choices.append(app_commands.Choice(name=label, value=video_id))
+    tracks, seen, missing = [], set(), []
+    for query, track in zip(wanted, results):
+        if track is None:
+            missing.append(query)
+        elif track.get("videoId") not in seen:
+            seen.add(track.get("videoId"))
+            tracks.append(Track.of(track).to_dict())
+
+    if tracks:
+        sock = ws_manager.socket_for(state)
+        if sock is not None and sock.queue_batch:
+            for start in range(0, len(tracks), QUEUE_BATCH_MAX):
+                await _ws_send(state, "queue_add", {"items": tracks[start:start + QUEUE_BATCH_MAX]})
+        else:
+            for item in tracks:
+                await _ws_send(state, "queue_add", {"item": item})
 
-        return choices
-    except Exception as e:
-        print(f"[Autocomplete] Error: {e}")
-        return []
+    lines = [f"➕ Added **{len(tracks)}** track(s)."]
+    if missing:
+        names = ", ".join(missing[:10]) + (f" and {len(missing) - 10} more" if len(missing) > 10 else "")
+        lines.append(f"No results for: {names}")
+    if skipped:
+        lines.append(f"Skipped {skipped} past the limit of {BOT_BULK_ADD_MAX}.")
+    await message.edit(content="\n".join(lines)[:2000])
 
 
 @bot.tree.command(name="skip", description="Vote to skip the current track")
@@ -731,10 +3287,154 @@ async def cmd_playback(interaction: discord.Interaction):
         )
         return
     controls = PlaybackControls(state)
-    await interaction.response.send_message(controls._header(), view=controls)
-    controls.message = await interaction.original_response()
-    state._controls  = controls
+    content  = controls._render()
+    await interaction.response.send_message(content, view=controls)
+    controls.message   = await interaction.original_response()
+    controls._rendered = controls._fingerprint(content)
+    state._controls    = controls
+
+
+# ── Shard supervisor ───────────────────────────────────────────────────────────
+async def _supervisor_call(path: str, payload: dict, timeout: float | None = 15) -> dict:
+    async with backend.session.post(
+        f"{BOT_SUPERVISOR_URL}{path}",
+        json=payload,
+        headers={"X-Supervisor-Secret": BOT_SUPERVISOR_SECRET},
+        timeout=aiohttp.ClientTimeout(total=timeout),
+    ) as resp:
+        data = await resp.json()
+        if not resp.ok:
+            raise RuntimeError(f"Supervisor {path} failed ({resp.status}): {data.get('error')}")
+        return data
+
+def _shard_groups(shard_count: int, per_process: int) -> list[list[int]]:
+    per_process = max(1, per_process)
+    return [list(range(i, min(i + per_process, shard_count))) for i in range(0, shard_count, per_process)]
+
+class ShardSupervisor:
+    """
+    Runs one bot process per group of shards, so FFmpeg handling, voice and
+    WS traffic for different guilds use different cores. Each process only
+    ever sees interactions (and so guild state) for its own shards. The
+    supervisor itself never connects to Discord; it owns what the shard
+    processes share and serves it over a loopback HTTP endpoint:
+
+      /token     the backend token (one login and refresh for all shards)
+      /search    the search cache, so a query is fetched once for all shards
+      /identify  spaces gateway identifies across processes
+
+    Shard processes that exit are restarted.
+    """
+    IDENTIFY_INTERVAL_SEC = 5.0
+    RESTART_DELAY_SEC     = 5.0
+
+    def __init__(self, shard_count: int, per_process: int):
+        self.groups  = _shard_groups(shard_count, per_process)
+        self.secret  = uuid.uuid4().hex
+        self.url     = ""
+        self.procs: dict[int, asyncio.subprocess.Process] = {}
+        self.stopping = asyncio.Event()
+        self._identify_lock = asyncio.Lock()
+        self._last_identify = 0.0
+
+    def _authorized(self, request) -> bool:
+        return request.headers.get("X-Supervisor-Secret") == self.secret
+
+    @staticmethod
+    def _reply(data: dict, status: int = 200):
+        from aiohttp import web
+        return web.json_response(data, status=status)
+
+    async def _handle_token(self, request):
+        if not self._authorized(request):
+            return self._reply({"error": "forbidden"}, status=403)
+        stale = (await request.json()).get("stale")
+        try:
+            if stale and backend.token == stale:
+                token = await backend.login()
+            else:
+                token = await backend.get_token()
+        except Exception as e:
+            return self._reply({"error": str(e)}, status=502)
+        return self._reply({"token": token})
+
+    async def _handle_search(self, request):
+        if not self._authorized(request):
+            return self._reply({"error": "forbidden"}, status=403)
+        body = await request.json()
+        try:
+            results = await search_cache.search(body["q"], int(body.get("limit", 25)))
+        except Exception as e:
+            return self._reply({"error": str(e)}, status=502)
+        return self._reply({"results": results})
+
+    async def _handle_identify(self, request):
+        if not self._authorized(request):
+            return self._reply({"error": "forbidden"}, status=403)
+        async with self._identify_lock:
+            wait = self._last_identify + self.IDENTIFY_INTERVAL_SEC - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self._last_identify = time.monotonic()
+        return self._reply({"ok": True})
+
+    async def _serve(self):
+        from aiohttp import web  # Only the supervisor process serves HTTP
+        app = web.Application()
+        app.router.add_post("/token", self._handle_token)
+        app.router.add_post("/search", self._handle_search)
+        app.router.add_post("/identify", self._handle_identify)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, "127.0.0.1", 0).start()
+        host, port = runner.addresses[0][:2]
+        self.url = f"http://{host}:{port}"
+        return runner
+
+    async def _run_group(self, index: int, shard_ids: list[int]):
+        env = {
+            **os.environ,
+            "BOT_SHARD_COUNT":       str(sum(len(g) for g in self.groups)),
+            "BOT_SHARD_IDS":         ",".join(map(str, shard_ids)),
+            "BOT_SUPERVISOR_URL":    self.url,
+            "BOT_SUPERVISOR_SECRET": self.secret,
+        }
+        while not self.stopping.is_set():
+            proc = await asyncio.create_subprocess_exec(sys.executable, os.path.abspath(__file__), env=env)
+            self.procs[index] = proc
+            shards_log.info("Started shards %s pid=%d", shard_ids, proc.pid)
+            code = await proc.wait()
+            if self.stopping.is_set():
+                break
+            shards_log.warning("Shards %s exited with %s, restarting", shard_ids, code)
+            try:
+                await asyncio.wait_for(self.stopping.wait(), self.RESTART_DELAY_SEC)
+            except asyncio.TimeoutError:
+                pass
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, self.stopping.set)
+            except NotImplementedError:
+                pass
+        runner = await self._serve()
+        await backend.login()
+        shards_log.info("%d processes for %d shards", len(self.groups), sum(map(len, self.groups)))
+        groups = [asyncio.create_task(self._run_group(i, ids)) for i, ids in enumerate(self.groups)]
+        await self.stopping.wait()
+        for proc in self.procs.values():
+            if proc.returncode is None:
+                proc.terminate()
+        await asyncio.gather(*groups, return_exceptions=True)
+        await runner.cleanup()
+        await backend.close()
 
 
 # ── Run ────────────────────────────────────────────────────────────────────────
-bot.run(DISCORD_TOKEN)
\ No newline at end of file
+if __name__ == "__main__":
+    if BOT_SHARD_COUNT > 1 and not BOT_SHARD_IDS:
+        asyncio.run(ShardSupervisor(BOT_SHARD_COUNT, BOT_SHARDS_PER_PROCESS).run())
+    else:
+        bot.run(DISCORD_TOKEN, log_handler=None)  # logging is configured above
\ No newline at end of file
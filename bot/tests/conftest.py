@@ -0,0 +1,25 @@
+import importlib.util
+import os
+import sys
+import tempfile
+
+import pytest
+
+BOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope="session")
+def main():
+    os.environ.update({
+        "BOT_AUDIO_CACHE_DIR": os.path.join(tempfile.mkdtemp(), "audio_cache"),
+        "BOT_SESSION_DB":      "",
+        "BOT_LOG_LEVEL":       "WARNING",
+    })
+    for key in ("DISCORD_TOKEN", "DISCORD_CLIENT_ID", "BOT_BACKEND_USERNAME", "BOT_BACKEND_PASSWORD"):
+        os.environ.setdefault(key, "test")
+    sys.path.insert(0, BOT_DIR)
+    spec   = importlib.util.spec_from_file_location("main", os.path.join(BOT_DIR, "main.py"))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules["main"] = module
+    spec.loader.exec_module(module)
+    return module
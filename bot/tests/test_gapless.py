@@ -0,0 +1,76 @@
+class FakeDecoder:
+    """Stands in for an FFmpeg decoder: numbered frames, then end of stream."""
+    def __init__(self, frames: int):
+        self.frames  = frames
+        self.reads   = 0
+        self.cleaned = False
+
+    def read(self) -> bytes:
+        if self.reads >= self.frames:
+            return b""
+        self.reads += 1
+        return b"f%d" % (self.reads - 1)
+
+    def cleanup(self):
+        self.cleaned = True
+
+
+def _source(main, decoder, start_ms=0):
+    audio = main.GaplessSource({"videoId": "v1"}, decoder, start_ms=start_ms)
+    return audio, audio.listen()
+
+
+def test_backward_seek_replays_history(main):
+    decoder = FakeDecoder(100)
+    audio, listener = _source(main, decoder, start_ms=1000)
+    frames = [listener.read() for _ in range(10)]
+    assert frames[-1] == b"f9"
+
+    assert audio.seek(1000 + 3 * main.FRAME_MS)
+    assert audio.position_ms == 1000 + 3 * main.FRAME_MS
+    assert [listener.read() for _ in range(7)] == frames[3:]
+    assert decoder.reads == 10  # Replayed, not decoded again
+    assert listener.read() == b"f10"
+
+
+def test_seek_outside_history_needs_a_new_decoder(main, monkeypatch):
+    monkeypatch.setattr(main, "BOT_SEEK_BUFFER_BYTES", 6)  # Three 2-byte frames
+    audio, listener = _source(main, FakeDecoder(10_000))
+    for _ in range(5):
+        listener.read()
+    assert not audio.seek(0)
+    assert audio.seek(3 * main.FRAME_MS)
+    assert not audio.seek(5 * main.FRAME_MS + main.BOT_SEEK_FORWARD_MAX_MS + main.FRAME_MS)
+    assert audio.position_ms == 3 * main.FRAME_MS
+
+
+def test_forward_seek_drains_the_decoder(main):
+    decoder = FakeDecoder(100)
+    audio, listener = _source(main, decoder)
+    listener.read()
+    assert audio.seek(20 * main.FRAME_MS)
+    assert listener.read() == b"f20"
+    assert decoder.reads == 21
+    assert audio.position_ms == 21 * main.FRAME_MS
+
+
+def test_forward_seek_sends_silence_when_the_drain_budget_runs_out(main, monkeypatch):
+    monkeypatch.setattr(main, "SEEK_DRAIN_BUDGET_SEC", 0.0)
+    decoder = FakeDecoder(100)
+    audio, listener = _source(main, decoder)
+    assert audio.seek(5 * main.FRAME_MS)
+
+    reads = [listener.read() for _ in range(5)]
+    assert reads == [main.discord.opus.OPUS_SILENCE] * 5  # One decoder frame per read
+    assert listener.read() == b"f5"
+    assert audio.position_ms == 6 * main.FRAME_MS
+
+
+def test_last_listener_cleans_up_the_decoder(main):
+    decoder = FakeDecoder(10)
+    audio, listener = _source(main, decoder)
+    other = audio.listen()
+    listener.cleanup()
+    assert not decoder.cleaned
+    other.cleanup()
+    assert decoder.cleaned and audio.closed and audio.listen() is None
@@ -0,0 +1,33 @@
+import asyncio
+
+
+def _track(video_id: str) -> dict:
+    return {"videoId": video_id, "title": video_id, "artist": "a"}
+
+
+def test_queue_diff_applies_once_per_guild_in_a_shared_room(main):
+    """Guilds in one muxed room get the same decoded message; each keeps its own queue."""
+    first, second = main.GuildState(1), main.GuildState(2)
+    room_state = {"event": "room_state", "room": "ROOM", "data": {
+        "isHost": False,
+        "queueVersion": 1,
+        "playback": {"currentItem": None, "isPlaying": False, "queue": [_track("v1"), _track("v2")]},
+    }}
+    diff = {"event": "queue_diff", "room": "ROOM", "data": {
+        "baseVersion": 1, "version": 2,
+        "queue": [{"op": "splice", "index": 2, "remove": 0, "items": [_track("v3")]}],
+    }}
+
+    async def deliver(msg):
+        for state in (first, second):  # As BackendSocket._dispatch fans out
+            await main._handle_ws_message(state, msg)
+
+    async def scenario():
+        await deliver(room_state)
+        await deliver(diff)
+
+    asyncio.run(scenario())
+    for state in (first, second):
+        assert [t.get("videoId") for t in state.playback["queue"]] == ["v1", "v2", "v3"]
+        assert state.queue_version == 2
+    assert first.playback is not second.playback
@@ -0,0 +1,77 @@
+import asyncio
+
+import pytest
+
+
+def _track(video_id: str) -> dict:
+    return {"videoId": video_id, "title": video_id, "artist": "a"}
+
+
+def _ids(queue) -> list[str]:
+    return [t.get("videoId") for t in queue]
+
+
+def test_apply_splice_and_move(main):
+    queue = main.TrackQueue([_track("v1"), _track("v2"), _track("v3")])
+    assert queue.apply([
+        {"op": "splice", "index": 1, "remove": 1, "items": [_track("v4"), _track("v5")]},
+        {"op": "move", "from": 0, "to": 3},
+    ])
+    assert _ids(queue) == ["v4", "v5", "v3", "v1"]
+    assert queue.revision == 1
+    assert all(isinstance(t, main.Track) for t in queue)
+
+
+@pytest.mark.parametrize("op", [
+    {"op": "splice", "index": 4, "remove": 0, "items": []},
+    {"op": "splice", "index": 2, "remove": 2, "items": []},
+    {"op": "splice", "index": -1, "remove": 0, "items": []},
+    {"op": "move", "from": 0, "to": 3},
+    {"op": "move", "from": "0", "to": 1},
+    {"op": "shuffle"},
+])
+def test_apply_rejects_ops_that_do_not_fit(main, op):
+    queue = main.TrackQueue([_track("v1"), _track("v2"), _track("v3")])
+    assert not queue.apply([op])
+
+
+def test_queue_diff_version_gap_requests_a_full_copy(main, monkeypatch):
+    sent = []
+
+    async def ws_send(state, event, data):
+        sent.append(event)
+
+    monkeypatch.setattr(main, "_ws_send", ws_send)
+    state = main.GuildState(1)
+
+    def diff(base, version, video_id):
+        return {"event": "queue_diff", "data": {
+            "baseVersion": base, "version": version,
+            "queue": [{"op": "splice", "index": 0, "remove": 0, "items": [_track(video_id)]}],
+        }}
+
+    async def scenario():
+        await main._handle_ws_message(state, {"event": "room_state", "data": {
+            "isHost": False,
+            "queueVersion": 1,
+            "playback": {"currentItem": None, "isPlaying": False, "queue": [_track("v1")]},
+        }})
+        await main._handle_ws_message(state, diff(1, 2, "v2"))
+        assert _ids(state.playback["queue"]) == ["v2", "v1"] and state.queue_version == 2
+
+        # A missed version: resync instead of applying against the wrong base
+        await main._handle_ws_message(state, diff(3, 4, "v3"))
+        assert sent == ["queue_sync"] and state.queue_version is None
+        # Diffs that arrive before the full copy are dropped
+        await main._handle_ws_message(state, diff(4, 5, "v4"))
+        assert _ids(state.playback["queue"]) == ["v2", "v1"] and sent == ["queue_sync"]
+
+        await main._handle_ws_message(state, {"event": "queue_updated", "data": {
+            "version": 5, "queue": [_track("v4"), _track("v3"), _track("v2"), _track("v1")],
+        }})
+        await main._handle_ws_message(state, diff(5, 6, "v5"))
+
+    asyncio.run(scenario())
+    assert _ids(state.playback["queue"]) == ["v5", "v4", "v3", "v2", "v1"]
+    assert state.queue_version == 6
+    assert sent == ["queue_sync"]
@@ -0,0 +1,45 @@
+def _track(video_id: str, title: str, artist: str = "a") -> dict:
+    return {"videoId": video_id, "title": title, "artist": artist}
+
+
+def _ids(tracks) -> list[str]:
+    return [t.get("videoId") for t in tracks]
+
+
+def test_search_matches_every_token_as_a_prefix(main):
+    index = main.TrackIndex(10)
+    index.add_many([
+        _track("v1", "Blue Monday", "New Order"),
+        _track("v2", "Blue Velvet", "Bobby Vinton"),
+        _track("v3", "Monday Monday", "The Mamas"),
+    ])
+    assert _ids(index.search("blu mon", 10)) == ["v1"]
+    assert _ids(index.search("new ORD", 10)) == ["v1"]
+    assert index.search("blue xyz", 10) == []
+    assert index.search("  ", 10) == []
+
+
+def test_search_ranks_title_prefix_then_recency(main):
+    index = main.TrackIndex(10)
+    index.add_many([
+        _track("v1", "Monday Monday", "The Mamas"),
+        _track("v2", "Blue Monday", "New Order"),
+        _track("v3", "Manic Monday", "The Bangles"),
+    ])
+    assert _ids(index.search("monday", 10)) == ["v1", "v3", "v2"]
+    assert _ids(index.search("monday", 2)) == ["v1", "v3"]
+    index.add(_track("v2", "Blue Monday", "New Order"))  # Seen again
+    assert _ids(index.search("monday", 10)) == ["v1", "v2", "v3"]
+
+
+def test_eviction_drops_least_recently_seen(main):
+    index = main.TrackIndex(2)
+    index.add(_track("v1", "Alpha"))
+    index.add(_track("v2", "Alpine"))
+    index.add(_track("v1", "Alpha"))
+    index.add(_track("v3", "Beta"))
+    assert len(index) == 2 and index.get("v2") is None
+    assert _ids(index.search("alp", 10)) == ["v1"]
+    index.add(_track("v4", "Gamma"))
+    assert index.search("alp", 10) == []
+    assert "alpha" not in index._sorted_tokens